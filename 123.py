@@ -1,9 +1,15 @@
+import sys
 import numpy as np
 import cv2 as cv
+from frame_source import WebcamFrameSource
 
-cap = cv.VideoCapture(0)
+cap = WebcamFrameSource(0).start()
 
-ret, frame = cap.read()
+first = cap.next_frame(0, timeout=5)
+if first is None:
+    cap.stop()
+    sys.exit("No frame from camera 0 within 5 s; is a webcam connected?")
+frame = first.image
 bbox = cv.selectROI('select', frame, False)
 
 x, y, w, h = bbox
@@ -17,10 +23,13 @@ cv.normalize(roi_hist, roi_hist, 0, 255, cv.NORM_MINMAX)
 
 term_crit = (cv.TERM_CRITERIA_EPS | cv.TERM_CRITERIA_COUNT, 10, 1)
 
+seq = 0
 while(1):
-    ret, frame = cap.read()
+    item = cap.next_frame(seq, timeout=1)
  
-    if ret == True:
+    if item is not None:
+        seq = item.seq
+        frame = item.image.copy()
         hsv = cv.cvtColor(frame, cv.COLOR_BGR2HSV)
         dst = cv.calcBackProject([hsv], [0], roi_hist, [0, 180], 1)
 
@@ -35,5 +44,5 @@ while(1):
             break
     else:
         break
-cap.release()
+cap.stop()
 cv.destroyAllWindows()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+FPS = 30
+
+
+class PreTriggerBuffer:
+    # Keeps the last few seconds as JPEG in memory so a clip can start before the key press
+    def __init__(self, max_bytes=64 * 1024 * 1024, quality=85, fps=FPS, workers=2, thread_init=None):
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.fps = fps
+        self.frames = deque()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.dropped = 0
+
+        # One ordered encoder thread for ingest, a separate pool for exports
+        self.encoder = ThreadPoolExecutor(max_workers=1, initializer=thread_init)
+        self.exporter = ThreadPoolExecutor(max_workers=workers, initializer=thread_init)
+        self._pending = 0
+
+    def push(self, frame, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self.lock:
+            # Never let the encoder queue grow behind the camera
+            if self._pending >= 4:
+                self.dropped += 1
+                return
+            self._pending += 1
+        self.encoder.submit(self._encode, frame, timestamp)
+
+    def _encode(self, frame, timestamp):
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        with self.lock:
+            self._pending -= 1
+            if not ok:
+                return
+            data = jpeg.tobytes()
+            self.frames.append((timestamp, data))
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes and self.frames:
+                _, old = self.frames.popleft()
+                self.bytes -= len(old)
+
+    def window(self, start, end):
+        with self.lock:
+            return [(t, data) for t, data in self.frames if start <= t <= end]
+
+    def duration(self):
+        with self.lock:
+            if len(self.frames) < 2:
+                return 0.0
+            return self.frames[-1][0] - self.frames[0][0]
+
+    def save_still(self, path):
+        # The newest frame is already JPEG, so a still is just a file write
+        with self.lock:
+            if not self.frames:
+                return None
+            _, data = self.frames[-1]
+        return self.exporter.submit(self._write_bytes, path, data)
+
+    def export_clip(self, path, before=5.0, after=5.0):
+        trigger = time.monotonic()
+        # Take the pre-trigger part now, before the memory cap can evict it
+        pre = self.window(trigger - before, trigger)
+        return self.exporter.submit(self._export_clip, path, trigger, pre, after)
+
+    def export_burst(self, directory, before=1.0, after=1.0, step=0.2):
+        trigger = time.monotonic()
+        pre = self.window(trigger - before, trigger)
+        return self.exporter.submit(self._export_burst, directory, trigger, pre, after, step)
+
+    def _wait_post(self, trigger, after):
+        time.sleep(max(0.0, trigger + after - time.monotonic()) + 0.1)
+        return [item for item in self.window(trigger, trigger + after) if item[0] > trigger]
+
+    def _export_clip(self, path, trigger, pre, after):
+        frames = pre + self._wait_post(trigger, after)
+        if not frames:
+            return None
+        writer = None
+        for _, data in frames:
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if writer is None:
+                h, w = image.shape[:2]
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (w, h))
+            writer.write(image)
+        writer.release()
+        print(f"Clip saved to: {path} ({len(frames)} frames)")
+        return path
+
+    def _export_burst(self, directory, trigger, pre, after, step):
+        frames = pre + self._wait_post(trigger, after)
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        next_t = None
+        for t, data in frames:
+            if next_t is not None and t < next_t:
+                continue
+            next_t = t + step
+            path = os.path.join(directory, f'still_{t - trigger:+07.2f}.jpg')
+            paths.append(self._write_bytes(path, data))
+        print(f"Burst saved to: {directory} ({len(paths)} stills)")
+        return paths
+
+    def _write_bytes(self, path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def close(self):
+        self.encoder.shutdown(wait=True)
+        self.exporter.shutdown(wait=True)
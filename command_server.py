@@ -0,0 +1,68 @@
+import sys
+import json
+import threading
+import socketserver
+from engine import COMMANDS
+
+
+class CommandServer:
+    # Text control surface for a headless engine: one command per line ("takeoff", "track 200 150 80 120",
+    # "status", ...) from stdin and/or a TCP socket on localhost, answered with "ok", "error: ..." or JSON
+    def __init__(self, engine, host='127.0.0.1', port=None, stdin=True):
+        self.engine = engine
+        self.stdin = stdin
+        self.server = None
+        if port is not None:
+            handler = type('Handler', (CommandHandler,), {'commands': self})
+            self.server = socketserver.ThreadingTCPServer((host, port), handler)
+            self.server.daemon_threads = True
+
+    @property
+    def port(self):
+        return self.server.server_address[1] if self.server is not None else None
+
+    def start(self):
+        if self.server is not None:
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        if self.stdin:
+            threading.Thread(target=self.read_stdin, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def execute(self, line):
+        parts = line.split()
+        if not parts:
+            return ''
+        name, args = parts[0].lower(), parts[1:]
+        if name == 'status':
+            return json.dumps(self.engine.status())
+        if name == 'metrics':
+            return self.engine.metrics.hud()
+        if name == 'help':
+            return 'commands: status metrics ' + ' '.join(sorted(COMMANDS))
+        try:
+            self.engine.submit(name, *args)
+        except ValueError as e:
+            return f'error: {e}'
+        return 'ok'
+
+    def read_stdin(self):
+        for line in sys.stdin:
+            reply = self.execute(line)
+            if reply:
+                print(reply, flush=True)
+        # EOF (e.g. stdin closed by a service manager) is not a reason to land
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    commands = None
+
+    def handle(self):
+        for raw in self.rfile:
+            reply = self.commands.execute(raw.decode('utf-8', 'replace'))
+            if reply:
+                self.wfile.write(reply.encode() + b'\n')
@@ -0,0 +1,34 @@
+import numpy as np
+
+
+class TargetFollower:
+    # Yaw to keep the target centred, forward/back to keep its apparent size in a band
+    def __init__(self, pid=(0.4, 0.4, 0), near_area=40000, far_area=10000, approach_speed=40):
+        self.pid = list(pid)
+        self.pError = 0
+        self.near_area = near_area
+        self.far_area = far_area
+        self.approach_speed = approach_speed
+
+    def reset(self):
+        self.pError = 0
+
+    def step(self, box, frame_w, frame_h, ego_motion=None):
+        x, y, w, h = box
+        cx = x + w // 2
+        error = cx - frame_w // 2
+        delta = error - self.pError
+        # Optical-flow tracker knows how far the whole image moved, i.e. our own yaw
+        if ego_motion is not None:
+            delta -= ego_motion[0]
+        yaw_velocity = int(np.clip(self.pid[0] * error + self.pid[1] * delta, -100, 100))
+        self.pError = error
+        area = w * h
+
+        if area > self.near_area:  # Якщо об'єкт дуже близько
+            for_back_velocity = -self.approach_speed  # Повільний рух назад
+        elif area < self.far_area:  # Якщо об'єкт далеко
+            for_back_velocity = self.approach_speed  # Повільний рух вперед
+        else:
+            for_back_velocity = 0  # Залишатися на місці
+        return yaw_velocity, for_back_velocity
@@ -0,0 +1,473 @@
+import time
+import queue
+import cv2
+from stream_health import StreamHealthMonitor
+from frame_source import DroneFrameSource
+from startup import FAST_STREAM_OPTIONS, StartupTimeline, fast_start, open_fast_stream
+from web_station import GroundStation
+from trackers import FlowTracker, create_tracker
+from frame_context import BufferPool, FrameContext
+from clip_buffer import PreTriggerBuffer
+from mission import MissionExecutor, MissionError, load_plan
+from reid import TargetReID
+from markers import MarkerLocalizer, MarkerHold, enable_mission_pads, mission_pad_pose
+from tracker_worker import TrackerWorker
+from roi_select import snap_box
+from controller import TargetFollower
+from motion_gate import MotionGate
+from stabilizer import OnlineStabilizer
+from metrics import REGISTRY, MetricsServer, watch_state
+
+WIDTH, HEIGHT = 640, 480
+FPS = 30
+
+# Name -> number of arguments; executed on the processing thread between frames
+COMMANDS = {
+    'takeoff': (0,), 'land': (0,), 'track': (0, 4), 'stop': (0,), 'clip': (0,), 'burst': (0,),
+    'hold': (0,), 'pad': (0,), 'mission': (0,), 'abort': (0,), 'quit': (0,),
+}
+
+
+class Engine:
+    # Frame source, tracker, controller and recorder with no display dependency. The GUI in main.py
+    # drives it frame by frame; headless, run() loops at whatever rate the stream delivers
+    def __init__(self, tello, save_path=None, fast=False, web_port=None, tracker='csrt', mission=None,
+                 markers=False, tracker_process=False, timeline=None, scheduler=None, stabilize=False,
+                 metrics_port=None):
+        self.tello = tello
+        # Per-stage thread budgets; OpenCV's pool size has to be set before the first tracker exists
+        self.scheduler = scheduler
+        if scheduler is not None:
+            scheduler.apply()
+        self.fast = fast
+        self.timeline = timeline or StartupTimeline(time.perf_counter())
+        self.for_back_velocity = 0
+        self.left_right_velocity = 0
+        self.up_down_velocity = 0
+        self.yaw_velocity = 0
+        self.send_rc_control = False
+        self.save_path = save_path
+        self.running = False
+        self.commands = queue.Queue()
+        self.frame = None
+        self.seq = 0
+
+        # Video writer
+        self.out = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT)) if save_path else None
+
+        self.tracker_name = tracker
+        # In a child process the tracker no longer shares the GIL with the GUI and receiver threads
+        self.tracker = TrackerWorker(tracker, WIDTH, HEIGHT) if tracker_process else create_tracker(tracker)
+        self.BB = None
+        self.follower = TargetFollower()
+        # Tracker and marker detector only run when the picture (or our own command) says something moved
+        self.track_gate = MotionGate()
+        self.marker_gate = MotionGate()
+        self.last_track = None
+        # Whether the tracker ran on the current frame rather than the gate reusing its last result
+        self.tracker_ran = False
+        # Camera motion the flow tracker measured on the current frame, reused by the stabilizer
+        self.frame_motion = None
+        # Frame the tracker last saw (init or update) and the frame processed before the current one
+        self.tracker_seq = None
+        self.prev_seq = None
+        # Remembers what the target looks like so it can be found again without selectROI
+        self.reid = TargetReID()
+
+        # Watches the video stream and rebuilds it in the background when it stalls
+        self.monitor = StreamHealthMonitor(self.tello, on_change=self.on_stream_state,
+                                           open_stream=self.open_stream if fast or scheduler else None)
+        # Publishes each decoded frame once, stamped with a sequence number
+        self.source = DroneFrameSource(self.tello, WIDTH, HEIGHT, self.monitor)
+        # Gray/HSV/pyramid buffers recycled from frame to frame
+        self.pool = BufferPool()
+
+        # Recent frames kept as JPEG so a clip can start before it was asked for
+        self.ring = PreTriggerBuffer(fps=FPS, thread_init=scheduler.thread_init('io') if scheduler else None)
+
+        # Scripted flight plan, validated now so a bad file fails before takeoff
+        self.mission = MissionExecutor(self.tello, load_plan(mission)) if mission else None
+
+        # ArUco board position hold and precision landing
+        self.markers = MarkerLocalizer(width=WIDTH, height=HEIGHT) if markers else None
+        self.marker_hold = MarkerHold()
+        self.marker_mode = None
+        # Precision landing reads the EDU mission pad under the drone; set once the drone is connected
+        self.pads = False
+
+        # Steadies the display/record branch only; tracking always sees the raw frames
+        self.stabilizer = OnlineStabilizer() if stabilize else None
+
+        # Optional browser view for observers on the LAN
+        self.station = GroundStation(port=web_port) if web_port is not None else None
+
+        # Rolling counters for long sessions; scraped over HTTP and shown as a HUD line
+        self.metrics = REGISTRY
+        self.metrics_server = MetricsServer(port=metrics_port) if metrics_port is not None else None
+        self.state_watch = None
+        self.frames_dropped = REGISTRY.counter('frames_dropped', 'Published frames the processing loop never saw')
+        self.tracker_updates = REGISTRY.rate('tracker_updates', 'Tracker updates run')
+        self.tracker_success = REGISTRY.rate('tracker_success', 'Tracker updates that kept the target')
+        self.tracker_skipped = REGISTRY.counter('tracker_skipped', 'Frames the motion gate let the tracker skip')
+        self.tracker_ms = REGISTRY.gauge('tracker_ms', 'Duration of the last tracker update')
+        self.rc_sent = REGISTRY.rate('rc_sent', 'RC commands sent')
+        REGISTRY.gauge('tracker_success_ratio', 'Share of recent tracker updates that kept the target',
+                       self.tracker_success_ratio)
+        REGISTRY.gauge('stream_reconnects', 'Video stream rebuilds after a stall or freeze', lambda: self.monitor.reconnects)
+        REGISTRY.gauge('clip_buffer_dropped', 'Frames the pre-trigger encoder could not keep up with', lambda: self.ring.dropped)
+        REGISTRY.gauge('battery_percent', 'Drone battery', lambda: self.tello.get_battery())
+
+    def on_stream_state(self, stale):
+        if stale:
+            print("Video stream is stale, hovering until it recovers")
+            if self.mission is not None:
+                self.mission.abort("video stream lost")
+            self.hover()
+        else:
+            print("Video stream recovered")
+            # A reconnect brings a new decoder thread
+            self.assign_decoder()
+
+    def open_stream(self, tello):
+        # Our own reader, so the decoder's thread count is set before it starts (djitellopy's uses FFmpeg's default)
+        if not hasattr(tello, 'get_udp_video_address'):
+            # Simulator, nothing to decode
+            return tello.get_frame_read()
+        configure = self.scheduler.configure_decoder if self.scheduler is not None else None
+        return open_fast_stream(tello, FAST_STREAM_OPTIONS if self.fast else {}, configure)
+
+    def assign_threads(self):
+        if self.scheduler is None:
+            return
+        self.scheduler.assign('control')
+        self.scheduler.assign('decode', self.source.thread)
+        self.assign_decoder()
+        if isinstance(self.tracker, TrackerWorker):
+            self.scheduler.assign_process(self.tracker.process.pid, 'vision')
+
+    def assign_decoder(self):
+        reader = self.tello.background_frame_read
+        worker = getattr(reader, 'worker', None)
+        if self.scheduler is not None and worker is not None:
+            self.scheduler.assign('decode', worker)
+
+    def hover(self):
+        self.for_back_velocity = 0
+        self.left_right_velocity = 0
+        self.up_down_velocity = 0
+        self.yaw_velocity = 0
+        if self.send_rc_control:
+            self.command_rc(0, 0, 0, 0)
+
+    def command_rc(self, left_right, for_back, up_down, yaw):
+        self.track_gate.note_command(left_right, for_back, up_down, yaw)
+        self.marker_gate.note_command(left_right, for_back, up_down, yaw)
+        self.tello.send_rc_control(left_right, for_back, up_down, yaw)
+        self.rc_sent.mark()
+
+    def start(self):
+        if self.fast:
+            # connect, streamon and decoder open overlap; the tracker is warmed up meanwhile
+            fast_start(self.tello, self.timeline, lambda: create_tracker(self.tracker_name), open_stream=self.open_stream)
+        else:
+            self.tello.connect()
+            self.tello.streamon()
+            self.timeline.mark('stream on')
+            if self.scheduler is not None:
+                self.open_stream(self.tello)
+        if self.markers is not None:
+            self.pads = enable_mission_pads(self.tello)
+        self.source.start()
+        self.assign_threads()
+        if self.station is not None:
+            self.station.start()
+            print(f"Ground station on http://localhost:{self.station.port}/")
+        self.state_watch = watch_state(self.tello)
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+            print(f"Metrics on http://127.0.0.1:{self.metrics_server.port}/metrics")
+        self.running = True
+
+    def close(self):
+        self.running = False
+        self.source.stop()
+        if self.stabilizer is not None:
+            for frame, timestamp in self.stabilizer.flush():
+                self.emit(frame, timestamp)
+        self.ring.close()
+        if isinstance(self.tracker, TrackerWorker):
+            self.tracker.close()
+        if self.station is not None:
+            self.station.stop()
+        if self.state_watch is not None:
+            self.state_watch.set()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.tello.end()
+        if self.out is not None:
+            self.out.release()
+
+    def run(self):
+        # Headless loop; commands arrive through submit() from another thread
+        self.start()
+        try:
+            while self.running:
+                item = self.source.next_frame(self.seq, timeout=0.1)
+                if item is None:
+                    self.run_commands()
+                    continue
+                self.process(item)
+        finally:
+            self.close()
+
+    def process(self, item):
+        # One frame through the pipeline; returns the annotated frame for whoever displays it
+        if self.seq == 0:
+            self.timeline.mark('first frame')
+        elif item.seq > self.seq + 1:
+            self.frames_dropped.inc(item.seq - self.seq - 1)
+        self.prev_seq = self.seq if self.seq else None
+        self.seq = item.seq
+        self.frame = item.image
+        # Every vision stage sees the clean frame; nothing is drawn on it or its views
+        context = FrameContext(item.image, self.pool, item.seq, item.timestamp)
+
+        # Commands run here so a 'track' starts on the very next frame
+        self.run_commands()
+
+        if self.markers is not None:
+            self.follow_markers(context)
+
+        self.frame_motion = None
+        self.tracker_ran = False
+        success = False
+        if self.BB is not None and not self.monitor.stale:
+            success, box = self.track(item.image, context)
+            if success and self.send_rc_control and self.marker_mode is None:
+                self.track_target(box, WIDTH, HEIGHT)
+
+        # Overlays only on the output copy, after the last vision stage
+        frame = item.image.copy()
+        if self.markers is not None:
+            self.markers.draw(frame)
+        if success:
+            x, y, w, h = [int(v) for v in box]
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+
+        output = [(frame, item.timestamp)]
+        if self.stabilizer is not None:
+            # Comes out radius frames later, warped once
+            output = self.stabilizer.push(frame, item.timestamp, context, self.frame_motion)
+        for frame, timestamp in output:
+            self.emit(frame, timestamp)
+        context.release()
+
+        if self.mission is not None:
+            self.mission.check_battery()
+        return output[-1][0] if output else None
+
+    def emit(self, frame, timestamp):
+        if self.station is not None:
+            self.station.publish_frame(frame)
+            self.station.publish_telemetry(**self.status())
+
+        # Write the frame to the video file
+        if self.out is not None:
+            self.out.write(frame)
+        self.ring.push(frame, timestamp)
+
+    def tracker_success_ratio(self):
+        # Both rates over the same window end, or the ratio can drift past 1
+        now = time.monotonic()
+        updates = self.tracker_updates.per_second(now)
+        return self.tracker_success.per_second(now) / updates if updates else float('nan')
+
+    def status(self):
+        return dict(seq=self.seq, fps=round(self.source.fps, 1), battery=self.tello.get_battery(),
+                    flying=self.send_rc_control, stale=self.monitor.stale, tracking=self.BB is not None,
+                    marker_mode=self.marker_mode, skipped=round(self.track_gate.skip_ratio, 2))
+
+    # Commands
+
+    def submit(self, name, *args):
+        # Thread-safe; bad commands are rejected here, in the caller's thread
+        if name not in COMMANDS:
+            raise ValueError(f"unknown command '{name}'")
+        if len(args) not in COMMANDS[name]:
+            raise ValueError(f"'{name}' takes {' or '.join(str(n) for n in COMMANDS[name])} arguments")
+        if name == 'track' and args:
+            args = tuple(int(v) for v in args)
+        if name in ('mission', 'abort') and self.mission is None:
+            raise ValueError("no mission loaded")
+        if name in ('hold', 'pad') and self.markers is None:
+            raise ValueError("marker detection is off")
+        if name == 'pad' and not self.pads:
+            raise ValueError("mission pads are not available")
+        self.commands.put((name, args))
+
+    def run_commands(self):
+        while True:
+            try:
+                name, args = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                getattr(self, 'do_' + name)(*args)
+            except Exception as e:
+                print(f"Command '{name}' failed: {e}")
+
+    def stop_mission(self, reason):
+        # Before any manual SDK command: the executor and this thread would share the drone's reply queue
+        if self.mission is None:
+            return
+        self.mission.abort(reason)
+        if not self.mission.join(timeout=self.tello.RESPONSE_TIMEOUT):
+            raise MissionError("mission is still waiting on its last command, try again")
+
+    def do_takeoff(self):
+        self.stop_mission("operator takeoff")
+        self.tello.takeoff()
+        self.send_rc_control = True
+
+    def do_land(self):
+        self.stop_mission("operator landing")
+        self.marker_mode = None
+        self.hover()
+        self.tello.land()
+        self.send_rc_control = False
+
+    def do_track(self, *box):
+        if self.frame is None:
+            raise ValueError("no frame yet")
+        if not box:
+            # No box given: whatever is under the crosshair
+            box = snap_box(self.frame, WIDTH // 2, HEIGHT // 2)
+        self.start_tracking(self.frame, box)
+        print(f"Tracking {box}")
+
+    def do_stop(self):
+        self.BB = None
+        self.last_track = None
+        self.marker_mode = None
+        if self.mission is not None:
+            self.mission.abort("operator")
+        self.hover()
+
+    def do_clip(self):
+        self.ring.export_clip(time.strftime("clip_%Y%m%d_%H%M%S.mp4"))
+
+    def do_burst(self):
+        self.ring.export_burst(time.strftime("burst_%Y%m%d_%H%M%S"))
+
+    def do_hold(self):
+        self.toggle_marker_mode('hold')
+
+    def do_pad(self):
+        self.toggle_marker_mode('land')
+
+    def toggle_marker_mode(self, mode):
+        if self.marker_mode != mode:
+            # Marker modes fly the RC sticks themselves
+            self.stop_mission(f"marker {mode}")
+        self.marker_mode = None if self.marker_mode == mode else mode
+        print(f"Marker mode: {self.marker_mode}")
+
+    def do_mission(self):
+        self.mission.start()
+
+    def do_abort(self):
+        self.mission.abort("operator")
+
+    def do_quit(self):
+        self.running = False
+
+    # Pipeline stages
+
+    def follow_markers(self, context):
+        if self.marker_gate.should_process(context, self.markers.roi):
+            pose = self.markers.update(context)
+        else:
+            pose = self.markers.pose
+        if self.marker_mode is None or not self.send_rc_control:
+            return
+        if self.marker_mode == 'hold':
+            self.command_rc(*self.marker_hold.step(pose))
+            return
+        # The ArUco pose is from the forward camera; landing needs the pad seen from below
+        command = self.marker_hold.landing_step(mission_pad_pose(self.tello))
+        if command == 'land':
+            self.marker_mode = None
+            self.tello.land()
+            self.send_rc_control = False
+        else:
+            self.command_rc(*(command or (0, 0, 0, 0)))
+
+    def track(self, frame, context=None):
+        view = context if context is not None else frame
+        if self.last_track is not None and not self.track_gate.should_process(view, self.last_track[1]):
+            # Nothing moved since the tracker last ran, its result still holds
+            success, box = self.last_track
+            self.tracker_skipped.inc()
+        else:
+            since = self.tracker_seq
+            self.tracker_seq = self.seq
+            start = time.perf_counter()
+            success, box = self.update_tracker(frame, context)
+            self.tracker_ms.set((time.perf_counter() - start) * 1000)
+            if success is None:
+                # Tracker worker still busy with its init; not a result, so not cached either
+                return False, box
+            self.tracker_updates.mark()
+            if success:
+                self.tracker_success.mark()
+            self.last_track = (success, box)
+            self.tracker_ran = True
+            if since is not None and since == self.prev_seq:
+                # Motion since the previous frame, which is what the stabilizer measures; after gated
+                # frames it spans several frames the stabilizer has already estimated itself
+                self.frame_motion = getattr(self.tracker, 'ego_transform', None)
+        return success, box
+
+    def update_tracker(self, frame, context):
+        # The flow tracker takes its gray view from the shared frame context
+        if context is not None and isinstance(self.tracker, FlowTracker):
+            success, box = self.tracker.update(context)
+        else:
+            success, box = self.tracker.update(frame)
+
+        view = context if context is not None else frame
+        if success is None:
+            # Pending worker result: the target is not lost, nothing to re-identify
+            return success, box
+        if success:
+            self.reid.learn(view, box)
+        else:
+            # Lost: look for the target's appearance and re-seed a fresh tracker on a verified match
+            found = self.reid.search(view)
+            if found is not None:
+                self.reset_tracker(frame, found)
+                success, box = True, found
+            elif self.mission is not None:
+                self.mission.abort("target lost")
+        return success, box
+
+    def start_tracking(self, frame, box):
+        self.BB = box
+        self.reset_tracker(frame, box)
+        self.reid.reset()
+        self.reid.learn(frame, box, force=True)
+
+    def reset_tracker(self, frame, box):
+        # The worker re-creates its tracker on init; in-process trackers are replaced
+        if not isinstance(self.tracker, TrackerWorker):
+            self.tracker = create_tracker(self.tracker_name)
+        self.tracker.init(frame, box)
+        self.tracker_seq = self.seq
+        self.last_track = None
+        self.track_gate.reset()
+
+    def track_target(self, box, frame_w, frame_h):
+        # On a gated frame the tracker's ego motion is from an older frame, not this one
+        ego_motion = getattr(self.tracker, 'ego_motion', None) if self.tracker_ran else None
+        self.yaw_velocity, self.for_back_velocity = self.follower.step(box, frame_w, frame_h, ego_motion)
+        self.command_rc(self.left_right_velocity, self.for_back_velocity, self.up_down_velocity, self.yaw_velocity)
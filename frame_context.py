@@ -0,0 +1,121 @@
+import threading
+from collections import defaultdict
+import cv2
+import numpy as np
+
+
+class BufferPool:
+    def __init__(self, max_per_shape=4):
+        self.max_per_shape = max_per_shape
+        self.free = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            if self.free[key]:
+                return self.free[key].pop()
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buf):
+        key = (buf.shape, buf.dtype.str)
+        with self.lock:
+            if len(self.free[key]) < self.max_per_shape:
+                self.free[key].append(buf)
+
+
+class FrameContext:
+    # A frame plus derived views that are computed on first use and at most once per frame
+    def __init__(self, frame, pool=None, seq=None, timestamp=None):
+        self.frame = frame
+        self.pool = pool
+        self.seq = seq
+        self.timestamp = timestamp
+        self.views = {}
+        self.retained = set()
+        # Re-entrant: pyramid levels are built from other views
+        self.lock = threading.RLock()
+
+    @classmethod
+    def wrap(cls, frame):
+        # Stages accept either the engine's shared context or a bare image; a bare image gets its own,
+        # unpooled context so the views are built the same way on both paths
+        return frame if isinstance(frame, cls) else cls(frame)
+
+    @property
+    def shape(self):
+        return self.frame.shape
+
+    @property
+    def ndim(self):
+        return self.frame.ndim
+
+    def _buffer(self, shape):
+        if self.pool is None:
+            return np.empty(shape, dtype=np.uint8)
+        return self.pool.acquire(shape)
+
+    def view(self, name):
+        with self.lock:
+            if name not in self.views:
+                self.views[name] = BUILDERS[name](self)
+            return self.views[name]
+
+    @property
+    def gray(self):
+        return self.view('gray')
+
+    @property
+    def gray_half(self):
+        return self.view('gray_half')
+
+    @property
+    def gray_quarter(self):
+        return self.view('gray_quarter')
+
+    def retain(self, name):
+        # For callers that keep a view past this frame; they hand it back to the pool themselves
+        with self.lock:
+            view = self.view(name)
+            self.retained.add(name)
+            return view
+
+    def release(self):
+        with self.lock:
+            views, self.views = self.views, {}
+            retained, self.retained = self.retained, set()
+        if self.pool is not None:
+            for name, buf in views.items():
+                # A grayscale frame is its own gray view, it does not belong to the pool
+                if name not in retained and buf is not self.frame:
+                    self.pool.release(buf)
+
+
+def _convert(code, channels):
+    def build(ctx):
+        h, w = ctx.frame.shape[:2]
+        shape = (h, w) if channels == 1 else (h, w, channels)
+        return cv2.cvtColor(ctx.frame, code, dst=ctx._buffer(shape))
+    return build
+
+
+def _gray(ctx):
+    if ctx.frame.ndim == 2:
+        return ctx.frame
+    return _convert(cv2.COLOR_BGR2GRAY, 1)(ctx)
+
+
+def _pyr_down(source):
+    def build(ctx):
+        src = ctx.frame if source is None else ctx.view(source)
+        h, w = src.shape[:2]
+        size = ((w + 1) // 2, (h + 1) // 2)
+        return cv2.pyrDown(src, dst=ctx._buffer((size[1], size[0]) + src.shape[2:]), dstsize=size)
+    return build
+
+
+BUILDERS = {
+    'gray': _gray,
+    'gray_half': _pyr_down('gray'),
+    'gray_quarter': _pyr_down('gray_half'),
+}
@@ -0,0 +1,148 @@
+import sys
+import time
+import threading
+from collections import namedtuple
+import cv2
+from metrics import REGISTRY
+from stream_health import is_placeholder
+
+WIDTH, HEIGHT = 640, 480
+
+Frame = namedtuple('Frame', ['seq', 'timestamp', 'image'])
+
+FRAMES = REGISTRY.rate('frames_published', 'Frames handed to consumers')
+ERRORS = REGISTRY.counter('frame_source_errors', 'Exceptions while grabbing a frame')
+STALE = REGISTRY.counter('frames_stale', 'Decoded frames withheld while the stream was stale')
+
+
+class FrameSource:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.latest = None
+        self.running = False
+        self.thread = None
+        # Smoothed rate at which new frames are actually published
+        self.fps = 0.0
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        while self.running:
+            try:
+                self.grab()
+            except Exception as e:
+                ERRORS.inc()
+                print(f"Frame source error: {e}")
+                time.sleep(0.5)
+
+    def grab(self):
+        raise NotImplementedError
+
+    def publish(self, image, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self.cond:
+            if self.latest is not None and timestamp > self.latest.timestamp:
+                rate = 1.0 / (timestamp - self.latest.timestamp)
+                self.fps = rate if self.fps == 0.0 else 0.9 * self.fps + 0.1 * rate
+            self.seq += 1
+            self.latest = Frame(self.seq, timestamp, image)
+            self.cond.notify_all()
+        FRAMES.mark()
+        return self.latest
+
+    def latest_frame(self):
+        with self.cond:
+            return self.latest
+
+    def next_frame(self, after_seq=0, timeout=None):
+        # Blocks until a frame newer than after_seq is published; None on timeout or stop
+        with self.cond:
+            ok = self.cond.wait_for(lambda: not self.running or self.seq > after_seq, timeout)
+            if not ok or self.seq <= after_seq:
+                return None
+            return self.latest
+
+    async def next_frame_async(self, after_seq=0, timeout=None):
+        # asyncio costs ~30 ms to import and only async consumers need it
+        import asyncio
+        return await asyncio.to_thread(self.next_frame, after_seq, timeout)
+
+
+class DroneFrameSource(FrameSource):
+    def __init__(self, tello, width=WIDTH, height=HEIGHT, monitor=None, poll_interval=0.002):
+        super().__init__()
+        self.tello = tello
+        self.width = width
+        self.height = height
+        self.monitor = monitor
+        self.poll_interval = poll_interval
+        self._last_raw = None
+
+    def read_raw(self):
+        if self.monitor is not None:
+            return self.monitor.read()
+        frame = self.tello.get_frame_read().frame
+        # The reader's black placeholder is not a frame
+        return None if frame is not None and is_placeholder(frame) else frame
+
+    def grab(self):
+        raw = self.read_raw()
+        # BackgroundFrameRead stores a new array per decoded frame, so identity tells us if it is new
+        if raw is None or raw is self._last_raw:
+            time.sleep(self.poll_interval)
+            return
+        timestamp = time.monotonic()
+        self._last_raw = raw
+
+        if self.monitor is not None and self.monitor.stale:
+            # Frozen or rebuilding stream: nothing worth handing to consumers
+            STALE.inc()
+            return
+        self.publish(cv2.resize(raw, (self.width, self.height)), timestamp)
+
+
+class WebcamFrameSource(FrameSource):
+    def __init__(self, index=0, width=WIDTH, height=HEIGHT, fourcc='MJPG', buffer_size=1):
+        super().__init__()
+        # V4L2 directly on Linux, so the buffer size and fourcc requests are honoured
+        api = cv2.CAP_V4L2 if sys.platform.startswith('linux') else cv2.CAP_ANY
+        self.cap = cv2.VideoCapture(index, api)
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width and height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        # Fewer queued buffers means fewer stale frames waiting in the driver
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+        self.width = width or int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = height or int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def grab(self):
+        ok, frame = self.cap.read()
+        if not ok:
+            time.sleep(0.01)
+            return
+        timestamp = time.monotonic()
+        if frame.shape[1] != self.width or frame.shape[0] != self.height:
+            frame = cv2.resize(frame, (self.width, self.height))
+        self.publish(frame, timestamp)
+
+    def stop(self):
+        super().stop()
+        self.cap.release()
@@ -1,36 +1,32 @@
-import os
+import time
+START = time.perf_counter()
+
 import cv2
-import numpy as np
 import argparse
-import keyboard
 from djitellopy import Tello
-
-WIDTH, HEIGHT = 640, 480
-FPS = 30
-
-def get_frame(tello, width=WIDTH, height=HEIGHT):
-    frame = tello.get_frame_read().frame
-    resized_frame = cv2.resize(frame, (width, height))
-    return resized_frame
-
-class RyzeTello:
-    def __init__(self, save_path):
-        self.tello = Tello()
-        self.for_back_velocity = 0
-        self.left_right_velocity = 0
-        self.up_down_velocity = 0
-        self.yaw_velocity = 0
+from startup import StartupTimeline
+from trackers import TRACKERS
+from engine import Engine
+from roi_select import StreamSelector
+
+KEY_COMMANDS = {ord('v'): 'clip', ord('b'): 'burst', ord('h'): 'hold', ord('p'): 'pad', ord('m'): 'mission',
+                ord('x'): 'abort', ord('t'): 'takeoff', ord('l'): 'land', ord('s'): 'stop'}
+
+class RyzeTello(Engine):
+    # OpenCV window over the engine: shows the processed frames and turns keys and clicks into commands
+    def __init__(self, save_path, fast=False, web_port=None, tracker='csrt', mission=None, markers=False,
+                 tracker_process=False, tello=None, scheduler=None, stabilize=False, metrics_port=None):
+        timeline = StartupTimeline(START)
+        timeline.mark('imports done')
+        # A SimTello can stand in for the real drone
+        super().__init__(tello if tello is not None else Tello(), save_path, fast, web_port, tracker, mission,
+                         markers, tracker_process, timeline, scheduler, stabilize, metrics_port)
         self.speed = 60
-        self.send_rc_control = False
-        self.save_path = save_path
-
-        # Video writer
-        self.out = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
-
-        self.tracker = cv2.TrackerCSRT_create()
-        self.BB = None
-        self.pid = [0.4, 0.4, 0]
-        self.pError = 0
+        # Metrics overlay, rebuilt twice a second rather than per frame
+        self.hud = ''
+        self.hud_time = 0.0
+        # Click/drag target selection drawn over the live view
+        self.selector = StreamSelector()
 
     def draw_crosshair(self, frame):
         h, w, _ = frame.shape
@@ -40,48 +36,95 @@ class RyzeTello:
         cv2.line(frame, (center_x - size, center_y), (center_x + size, center_y), (255, 255, 255), 2)
         cv2.line(frame, (center_x, center_y - size), (center_x, center_y + size), (255, 255, 255), 2)
 
-    def run(self):
-        self.tello.connect()
-        self.tello.streamon()
+    def draw_stale(self, frame):
+        cv2.putText(frame, 'VIDEO STALE', (30, 90), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        return frame
+
+    def draw_hud(self, frame):
+        now = time.monotonic()
+        if now - self.hud_time > 0.5:
+            self.hud = self.metrics.hud()
+            self.hud_time = now
+        cv2.putText(frame, self.hud, (8, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        return frame
 
-        while True:
-            frame = get_frame(self.tello, WIDTH, HEIGHT)
+    def run(self):
+        self.start()
+        cv2.namedWindow('Tello Drone')
+        self.selector.attach('Tello Drone')
+
+        shown = None
+        while self.running:
+            item = self.source.next_frame(self.seq, timeout=0.1)
+            if item is None:
+                # No new frame yet, only keep the window responsive. Stale frames are never published,
+                # so the warning goes over the last frame shown
+                self.run_commands()
+                if self.monitor.stale and shown is not None:
+                    cv2.imshow('Tello Drone', self.draw_stale(shown.copy()))
+                # Land/stop still have to work while the video is down
+                if self.handle_window_key(cv2.waitKey(1) & 0xFF):
+                    break
+                continue
+
+            # Tracking starts on the very frame the selection completes
+            self.selector.set_frame(item.image)
+            box = self.selector.poll()
+            if box is not None:
+                self.submit('track', *box)
 
             # if self.handle_keys(frame):
             #     break
-            #
-            # if self.BB is not None:
-            #     success, frame, box = self.track(frame)
-            #     if success:
-            #         self.track_target(box, WIDTH, HEIGHT)
-            #
+            frame = self.process(item)
+            if self.stabilizer is not None and self.selector.armed:
+                # Pick on the live, unwarped frame so the box lands where it was drawn
+                frame = item.image.copy()
+            if frame is None:
+                # Stabilizer still filling its look-ahead
+                if self.handle_window_key(cv2.waitKey(1) & 0xFF):
+                    break
+                continue
+
             # self.draw_crosshair(frame)
             #
             # cv2.putText(frame, f'Battery: {self.tello.get_battery()}%', (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            # The recorder and clip buffer keep this frame, so the overlay goes on a copy
+            frame = self.draw_hud(frame.copy())
+            self.selector.draw(frame)
             cv2.imshow('Tello Drone', frame)
+            shown = frame
 
-            # Write the frame to the video file
-            self.out.write(frame)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            if self.handle_window_key(cv2.waitKey(1) & 0xFF):
                 break
 
         cv2.destroyAllWindows()
-        self.tello.end()
-        self.out.release()
+        self.close()
+
+    def handle_window_key(self, key):
+        # Returns True to quit
+        if key == ord('q'):
+            return True
+        if key == ord('c'):
+            self.selector.arm()
+        elif key in KEY_COMMANDS:
+            try:
+                self.submit(KEY_COMMANDS[key])
+            except ValueError as e:
+                print(e)
+        return False
 
     def handle_keys(self, frame):
+        # keyboard hooks are slow to import and only needed for manual control
+        import keyboard
+
         if keyboard.is_pressed('esc'):
             return True
         elif keyboard.is_pressed('t'):
-            self.tello.takeoff()
-            self.send_rc_control = True
+            self.submit('takeoff')
         elif keyboard.is_pressed('l'):
-            self.tello.land()
-            self.send_rc_control = False
+            self.submit('land')
         elif keyboard.is_pressed('c'):
-            self.BB = cv2.selectROI("Tello Drone", frame, fromCenter=False, showCrosshair=True)
-            self.tracker.init(frame, self.BB)
+            self.selector.arm()
 
         if self.send_rc_control:
             # fly forward and back
@@ -121,39 +164,54 @@ class RyzeTello:
             if keyboard.is_pressed('-'):
                 self.speed = max(self.speed - 5, 5)
 
-            self.tello.send_rc_control(self.left_right_velocity, self.for_back_velocity, self.up_down_velocity, self.yaw_velocity)
+            self.command_rc(self.left_right_velocity, self.for_back_velocity, self.up_down_velocity, self.yaw_velocity)
 
         return False
 
-    def track(self, frame):
-        success, box = self.tracker.update(frame)
-        if success:
-            x, y, w, h = [int(v) for v in box]
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-        return success, frame, box
-
-    def track_target(self, box, frame_w, frame_h):
-        x, y, w, h = box
-        cx = x + w // 2
-        cy = y + h // 2
-        error = cx - frame_w // 2
-        self.yaw_velocity = int(np.clip(self.pid[0] * error + self.pid[1] * (error - self.pError), -100, 100))
-        self.pError = error
-        area = w * h
-
-        if area > 40000:  # Якщо об'єкт дуже близько
-            self.for_back_velocity = -40  # Повільний рух назад
-        elif area < 10000:  # Якщо об'єкт далеко
-            self.for_back_velocity = 40  # Повільний рух вперед
-        else:
-            self.for_back_velocity = 0  # Залишатися на місці
-
-        self.tello.send_rc_control(self.left_right_velocity, self.for_back_velocity, self.up_down_velocity, self.yaw_velocity)
-
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-sp', '--save_path', type=str, default="drone_video.mp4", help="Path where video will be saved")
+    parser.add_argument('--fast-start', action='store_true', help="Overlap connect/streamon/decoder open and open the stream with minimal probing")
+    parser.add_argument('--web-port', type=int, default=None, help="Serve the processed feed and telemetry to browsers on this port")
+    parser.add_argument('--tracker', choices=sorted(TRACKERS), default='csrt', help="Tracker backend")
+    parser.add_argument('--mission', type=str, default=None, help="JSON/YAML flight plan, started with 'm' and aborted with 'x'")
+    parser.add_argument('--markers', action='store_true', help="Detect the ArUco board for position hold ('h'); 'p' lands on a Tello EDU mission pad")
+    parser.add_argument('--tracker-process', action='store_true', help="Run the tracker in a separate process fed through shared memory")
+    parser.add_argument('--sim', action='store_true', help="Fly the kinematic simulator instead of a real drone")
+    parser.add_argument('--headless', action='store_true', help="No window; control through stdin (and --control-port), view through --web-port")
+    parser.add_argument('--stabilize', action='store_true', help="Stabilize the displayed and recorded video (adds a few frames of delay)")
+    parser.add_argument('--schedule', action='store_true', help="Give decode, OpenCV and control their own thread budgets")
+    parser.add_argument('--pin', action='store_true', help="With --schedule, also pin the stages to CPU cores (Linux)")
+    parser.add_argument('--metrics-port', type=int, default=None, help="Serve Prometheus metrics on this localhost port")
+    parser.add_argument('--control-port', type=int, default=None, help="Also accept headless commands on this localhost TCP port")
     args = parser.parse_args()
 
-    drone = RyzeTello(args.save_path)
-    drone.run()
+    sim = None
+    if args.sim:
+        from simulator import SimTello
+        sim = SimTello(realtime=True)
+    fast = args.fast_start and not args.sim
+    scheduler = None
+    if args.schedule:
+        from scheduler import CoreScheduler
+        scheduler = CoreScheduler(pin=args.pin)
+
+    if args.headless:
+        from command_server import CommandServer
+        timeline = StartupTimeline(START)
+        engine = Engine(sim if sim is not None else Tello(), args.save_path, fast, args.web_port, args.tracker,
+                        args.mission, args.markers, args.tracker_process, timeline, scheduler,
+                        args.stabilize, args.metrics_port)
+        control = CommandServer(engine, port=args.control_port).start()
+        if control.port is not None:
+            print(f"Accepting commands on 127.0.0.1:{control.port}")
+        try:
+            engine.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            control.stop()
+    else:
+        drone = RyzeTello(args.save_path, fast, args.web_port, args.tracker, args.mission, args.markers,
+                          args.tracker_process, sim, scheduler, args.stabilize, args.metrics_port)
+        drone.run()
@@ -0,0 +1,179 @@
+from collections import namedtuple
+import cv2
+import numpy as np
+from frame_context import FrameContext
+
+# Tello camera at 960x720 (approximate factory intrinsics); scaled to the working frame size
+TELLO_FX, TELLO_CX, TELLO_CY, TELLO_WIDTH = 921.2, 480.0, 360.0, 960
+
+# Centimetres and degrees. source 'aruco': board in the forward camera's frame, x right, y down, z forward.
+# source 'pad': mission pad from above, x to the drone's right, y ahead of it, z the height over the pad
+Pose = namedtuple('Pose', ['x', 'y', 'z', 'yaw', 'source'])
+
+
+def camera_matrix(width, height):
+    s = width / TELLO_WIDTH
+    return np.array([[TELLO_FX * s, 0, width / 2],
+                     [0, TELLO_FX * s, height / 2],
+                     [0, 0, 1]], dtype=np.float64)
+
+
+class MarkerLocalizer:
+    def __init__(self, grid=(2, 2), marker_length=10.0, separation=2.0, dictionary=cv2.aruco.DICT_4X4_50,
+                 width=640, height=480, roi_margin=0.5, downscale=True):
+        self.dictionary = cv2.aruco.getPredefinedDictionary(dictionary)
+        self.board = cv2.aruco.GridBoard(grid, marker_length, separation, self.dictionary)
+        params = cv2.aruco.DetectorParameters()
+        params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX
+        self.detector = cv2.aruco.ArucoDetector(self.dictionary, params)
+
+        self.camera = camera_matrix(width, height)
+        self.dist = np.zeros(5)
+        self.roi_margin = roi_margin
+        self.downscale = downscale
+
+        self.roi = None
+        self.velocity = np.zeros(2)
+        self.last_center = None
+        self.rvec = None
+        self.tvec = None
+        self.pose = None
+
+    def detect(self, image, region=None, scale=1.0):
+        x0, y0 = 0, 0
+        if region is not None:
+            x0, y0, w, h = [int(v * scale) for v in region]
+            image = image[y0:y0 + h, x0:x0 + w]
+            if image.size == 0:
+                return None, None
+        corners, ids, _ = self.detector.detectMarkers(image)
+        if ids is None:
+            return None, None
+        # Back to full-resolution frame coordinates
+        corners = [(c + np.float32([x0, y0])) / scale for c in corners]
+        return corners, ids
+
+    def update(self, frame):
+        context = FrameContext.wrap(frame)
+        gray = context.gray
+        frame_h, frame_w = gray.shape[:2]
+        gray_half = context.gray_half if self.downscale else None
+
+        corners = ids = None
+        if self.roi is not None:
+            # Only the predicted area, on the half-size frame while the markers are big enough
+            if self.downscale:
+                corners, ids = self.detect(gray_half, self.roi, 0.5)
+            if ids is None:
+                corners, ids = self.detect(gray, self.roi)
+        if ids is None:
+            corners, ids = self.detect(gray_half, None, 0.5) if self.downscale else (None, None)
+        if ids is None:
+            corners, ids = self.detect(gray)
+        if ids is None:
+            self.roi = None
+            self.last_center = None
+            self.pose = None
+            return None
+
+        self.predict_roi(corners, frame_w, frame_h)
+        self.pose = self.estimate_pose(corners, ids)
+        return self.pose
+
+    def predict_roi(self, corners, frame_w, frame_h):
+        points = np.concatenate([c.reshape(-1, 2) for c in corners])
+        x, y = points.min(axis=0)
+        x1, y1 = points.max(axis=0)
+        center = np.array([(x + x1) / 2, (y + y1) / 2])
+        if self.last_center is not None:
+            self.velocity = center - self.last_center
+        self.last_center = center
+
+        # Next position assuming constant image velocity, padded by a share of the board size
+        w, h = x1 - x, y1 - y
+        pad_x, pad_y = w * self.roi_margin + abs(self.velocity[0]), h * self.roi_margin + abs(self.velocity[1])
+        x, y = x + self.velocity[0] - pad_x, y + self.velocity[1] - pad_y
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        x1, y1 = min(int(x + w + 2 * pad_x), frame_w), min(int(y + h + 2 * pad_y), frame_h)
+        self.roi = (x0, y0, x1 - x0, y1 - y0)
+
+    def estimate_pose(self, corners, ids):
+        obj_points, img_points = self.board.matchImagePoints(corners, ids)
+        if obj_points is None or len(obj_points) < 4:
+            return None
+        use_guess = self.rvec is not None
+        ok, rvec, tvec = cv2.solvePnP(obj_points, img_points, self.camera, self.dist,
+                                      self.rvec, self.tvec, useExtrinsicGuess=use_guess,
+                                      flags=cv2.SOLVEPNP_ITERATIVE)
+        if not ok:
+            self.rvec = self.tvec = None
+            return None
+        self.rvec, self.tvec = rvec, tvec
+
+        # Board centre rather than its corner marker origin
+        rotation, _ = cv2.Rodrigues(rvec)
+        size = np.array(self.board.getRightBottomCorner(), dtype=np.float64)
+        center = rotation @ np.array([size[0] / 2, size[1] / 2, 0.0]) + tvec.ravel()
+        yaw = np.degrees(np.arctan2(rotation[0, 2], rotation[2, 2]))
+        return Pose(float(center[0]), float(center[1]), float(center[2]), float(yaw), 'aruco')
+
+    def draw(self, frame):
+        if self.pose is not None and self.rvec is not None:
+            cv2.drawFrameAxes(frame, self.camera, self.dist, self.rvec, self.tvec, 5)
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 255), 1)
+
+
+def enable_mission_pads(tello):
+    # Tello EDU only; the downward camera looks for pads while the forward one keeps streaming
+    try:
+        tello.enable_mission_pads()
+        tello.set_mission_pad_detection_direction(0)
+        return True
+    except Exception as e:
+        print(f"Mission pads unavailable, precision landing is off: {e}")
+        return False
+
+
+def mission_pad_pose(tello):
+    # Tello EDU mission pads need no vision at all; distances are in the state packet.
+    # The state gives the drone's position in the pad's frame (x towards the rocket, y to its left),
+    # so lay the pad with its rocket pointing the way the drone faces
+    if tello.get_mission_pad_id() < 1:
+        return None
+    return Pose(float(tello.get_mission_pad_distance_y()), -float(tello.get_mission_pad_distance_x()),
+                float(tello.get_mission_pad_distance_z()), 0.0, 'pad')
+
+
+class MarkerHold:
+    def __init__(self, distance=100.0, gains=(0.5, 0.5, 0.5, 0.8), limit=40, land_tolerance=8.0, land_height=40.0):
+        self.distance = distance
+        self.gains = gains
+        self.limit = limit
+        self.land_tolerance = land_tolerance
+        self.land_height = land_height
+
+    def clamp(self, value):
+        return int(np.clip(value, -self.limit, self.limit))
+
+    def step(self, pose):
+        # RC values (left_right, for_back, up_down, yaw) that keep the board centred at the set distance
+        if pose is None:
+            return 0, 0, 0, 0
+        kx, kz, ky, kyaw = self.gains
+        return (self.clamp(kx * pose.x),
+                self.clamp(kz * (pose.z - self.distance)),
+                self.clamp(-ky * pose.y),
+                self.clamp(-kyaw * pose.yaw))
+
+    def landing_step(self, pose):
+        # Mission pad pose: centre over the pad, descend, land when low and centred
+        if pose is None:
+            return None
+        centred = abs(pose.x) < self.land_tolerance and abs(pose.y) < self.land_tolerance
+        if centred and pose.z < self.land_height:
+            return 'land'
+        kx, kz, _, _ = self.gains
+        descend = -20 if centred else 0
+        return (self.clamp(kx * pose.x), self.clamp(kz * pose.y), descend, 0)
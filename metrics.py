@@ -0,0 +1,220 @@
+import os
+import sys
+import time
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Every metric has one writing thread; updates are plain attribute/deque operations, so neither the
+# hot path nor a scrape ever takes a lock
+
+
+class Counter:
+    def __init__(self, name, help=''):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def samples(self):
+        return [(self.name + '_total', self.value)]
+
+
+class Gauge:
+    def __init__(self, name, help='', function=None):
+        self.name = name
+        self.help = help
+        self.function = function
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def read(self):
+        if self.function is None:
+            return self.value
+        try:
+            return self.function()
+        except Exception:
+            return float('nan')
+
+    def samples(self):
+        value = self.read()
+        return [(self.name, value if value is not None else float('nan'))]
+
+
+class Rate:
+    # Events per second over a rolling window, plus the running total
+    def __init__(self, name, help='', window=5.0, max_events=4096):
+        self.name = name
+        self.help = help
+        self.window = window
+        # Bounded: at most max_events per window are remembered, enough for 800 Hz over 5 s
+        self.events = deque(maxlen=max_events)
+        self.total = 0
+        self.started = None
+
+    def mark(self, n=1):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        self.events.append((now, n))
+        self.total += n
+
+    def per_second(self, now=None):
+        if self.started is None:
+            return 0.0
+        if now is None:
+            now = time.monotonic()
+        # list() copies the deque in one step under the GIL, safe against a concurrent append
+        recent = sum(n for t, n in list(self.events) if now - t <= self.window)
+        # Shortly after the first event the window is not full yet
+        return recent / max(min(self.window, now - self.started), 1e-3)
+
+    def samples(self):
+        return [(self.name + '_total', self.total), (self.name + '_per_second', round(self.per_second(), 3))]
+
+
+def process_rss():
+    # Resident memory in bytes; current on Linux, peak elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, **kwargs):
+        # Creation is rare and locked; lookups after that go straight to the dict
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.setdefault(name, cls(name, **kwargs))
+        return metric
+
+    def counter(self, name, help=''):
+        return self._get(Counter, name, help=help)
+
+    def gauge(self, name, help='', function=None):
+        gauge = self._get(Gauge, name, help=help)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def rate(self, name, help='', window=5.0):
+        return self._get(Rate, name, help=help, window=window)
+
+    def value(self, name):
+        metric = self.metrics.get(name)
+        if metric is None:
+            return None
+        if isinstance(metric, Rate):
+            return metric.per_second()
+        if isinstance(metric, Gauge):
+            return metric.read()
+        return metric.value
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+        for metric in list(self.metrics.values()):
+            for sample, value in metric.samples():
+                kind = 'counter' if sample.endswith('_total') else 'gauge'
+                if metric.help:
+                    lines.append(f'# HELP {sample} {metric.help}')
+                lines.append(f'# TYPE {sample} {kind}')
+                lines.append(f'{sample} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def hud(self):
+        # One compact line for an overlay or a log
+        fields = [('frames_published', 'fps {:.1f}', 1), ('frames_dropped', 'drop {:.0f}', 1),
+                  ('frame_source_errors', 'err {:.0f}', 1), ('tracker_success_ratio', 'trk {:.0%}', 1),
+                  ('tracker_ms', '{:.1f} ms', 1), ('rc_sent', 'rc {:.0f}/s', 1),
+                  ('state_packets', 'state {:.0f}/s', 1), ('process_rss_bytes', 'rss {:.0f}MB', 2 ** -20)]
+        parts = []
+        for name, pattern, scale in fields:
+            value = self.value(name)
+            if value is not None and value == value:
+                parts.append(pattern.format(value * scale))
+        return ' | '.join(parts)
+
+
+REGISTRY = Registry()
+REGISTRY.gauge('process_rss_bytes', 'Resident memory of this process', process_rss)
+
+
+def watch_state(tello, registry=REGISTRY, interval=0.02):
+    # djitellopy's receiver stores a new state dict per UDP packet, so a change of identity is one packet.
+    # Returns an event that stops the watcher when set
+    packets = registry.rate('state_packets', 'Tello state packets received')
+    stop = threading.Event()
+
+    def run():
+        last = None
+        while not stop.is_set():
+            try:
+                state = tello.get_current_state()
+            except Exception:
+                state = None
+            if state is not None and state is not last:
+                packets.mark()
+                last = state
+            stop.wait(interval)
+
+    threading.Thread(target=run, daemon=True).start()
+    return stop
+
+
+class MetricsServer:
+    # GET /metrics for Prometheus; localhost only by default
+    def __init__(self, registry=REGISTRY, host='127.0.0.1', port=9100):
+        self.registry = registry
+        handler = type('MetricsHandler', (MetricsHandler,), {'registry': registry})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
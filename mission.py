@@ -0,0 +1,259 @@
+import json
+import math
+import time
+import queue
+import threading
+
+
+class MissionError(Exception):
+    pass
+
+
+def _range(name, low, high):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+            return f"{name} must be between {low} and {high}, got {value!r}"
+    return check
+
+
+XYZ = _range('x/y/z', -500, 500)
+
+# Worst-case rates for timing a leg: up/down fly at the drone's current speed setting, which can be as low as
+# the SDK minimum; turns run at roughly this many degrees per second
+MIN_SPEED = 10
+YAW_SPEED = 30
+# Added to the expected duration of a move before the reply counts as lost
+REPLY_MARGIN = 10.0
+
+# name -> (required fields, {field: validator}, SDK command template)
+COMMANDS = {
+    'takeoff': ((), {}, 'takeoff'),
+    'land': ((), {}, 'land'),
+    'hover': ((), {}, 'stop'),
+    'wait': (('seconds',), {'seconds': _range('seconds', 0, 600)}, None),
+    'go': (('x', 'y', 'z', 'speed'), {'x': XYZ, 'y': XYZ, 'z': XYZ, 'speed': _range('speed', 10, 100)},
+           'go {x} {y} {z} {speed}'),
+    'curve': (('x1', 'y1', 'z1', 'x2', 'y2', 'z2', 'speed'),
+              {'x1': XYZ, 'y1': XYZ, 'z1': XYZ, 'x2': XYZ, 'y2': XYZ, 'z2': XYZ,
+               'speed': _range('speed', 10, 60)},
+              'curve {x1} {y1} {z1} {x2} {y2} {z2} {speed}'),
+    'rotate': (('angle',), {'angle': _range('angle', -360, 360)}, None),
+    'up': (('distance',), {'distance': _range('distance', 20, 500)}, 'up {distance}'),
+    'down': (('distance',), {'distance': _range('distance', 20, 500)}, 'down {distance}'),
+}
+
+
+def load_plan(path):
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            # Imported only for YAML plans, it is slow to load
+            try:
+                import yaml
+            except ImportError:
+                raise MissionError("PyYAML is not installed, use a JSON plan")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if isinstance(data, list):
+        data = {'commands': data}
+    return compile_plan(data)
+
+
+def compile_plan(data):
+    # Validates the whole plan up front and turns every step into its SDK command,
+    # so nothing is left to compute between legs in flight
+    errors = []
+    steps = []
+    if not isinstance(data, dict) or not isinstance(data.get('commands', []), list):
+        raise MissionError("Mission plan must be a list of steps or a mapping with a 'commands' list")
+    default_speed = data.get('speed')
+    for i, step in enumerate(data.get('commands', [])):
+        if not isinstance(step, dict):
+            errors.append(f"step {i}: expected a mapping with a 'cmd' field, got {step!r}")
+            continue
+        step = dict(step)
+        name = step.pop('cmd', None)
+        if name not in COMMANDS:
+            errors.append(f"step {i}: unknown command {name!r}")
+            continue
+        if 'speed' in COMMANDS[name][0] and 'speed' not in step and default_speed is not None:
+            step['speed'] = default_speed
+
+        required, validators, template = COMMANDS[name]
+        missing = [field for field in required if field not in step]
+        if missing:
+            errors.append(f"step {i} ({name}): missing {', '.join(missing)}")
+            continue
+        problems = [problem for problem in (check(step[field]) for field, check in validators.items()) if problem]
+        if problems:
+            errors.extend(f"step {i} ({name}): {problem}" for problem in problems)
+            # The checks below assume numbers
+            continue
+
+        if name == 'go' and all(-20 < step[k] < 20 for k in ('x', 'y', 'z')):
+            errors.append(f"step {i} (go): x, y and z cannot all be within -20..20")
+        if name == 'rotate' and step['angle'] == 0:
+            errors.append(f"step {i} (rotate): angle cannot be 0")
+            continue
+
+        steps.append(compile_step(name, step, template))
+
+    if errors:
+        raise MissionError("Invalid mission plan:\n  " + "\n  ".join(errors))
+    if not steps:
+        raise MissionError("Mission plan has no commands")
+    return steps
+
+
+def compile_step(name, step, template):
+    # (name, SDK command, seconds): how long a wait lasts, or how long a move may take to be acknowledged
+    if name == 'wait':
+        return (name, None, float(step['seconds']))
+    if name == 'rotate':
+        angle = int(step['angle'])
+        return (name, f"{'cw' if angle > 0 else 'ccw'} {abs(angle)}", abs(angle) / YAW_SPEED + REPLY_MARGIN)
+    # Extra fields (notes and the like) are ignored
+    fields = {k: int(step[k]) for k in COMMANDS[name][0]}
+    return (name, template.format(**fields), leg_seconds(name, fields) + REPLY_MARGIN)
+
+
+def leg_seconds(name, fields):
+    if name == 'go':
+        return math.hypot(fields['x'], fields['y'], fields['z']) / fields['speed']
+    if name == 'curve':
+        # The arc is no longer than the two chords through the mid point
+        first = math.hypot(fields['x1'], fields['y1'], fields['z1'])
+        second = math.hypot(fields['x2'] - fields['x1'], fields['y2'] - fields['y1'], fields['z2'] - fields['z1'])
+        return (first + second) / fields['speed']
+    if name in ('up', 'down'):
+        return fields['distance'] / MIN_SPEED
+    return 0.0
+
+
+class MissionExecutor:
+    def __init__(self, tello, steps=(), min_battery=20, on_finish=None, retries=2):
+        self.tello = tello
+        self.min_battery = min_battery
+        self.retries = retries
+        self.on_finish = on_finish
+        self.queue = queue.Queue()
+        for step in steps:
+            self.queue.put(step)
+
+        self.current = None
+        self.completed = 0
+        self.aborted = None
+        self.running = False
+        self.thread = None
+        # running and stop_sent change together: the worker's exit and an abort must not interleave
+        self.lock = threading.Lock()
+        self.stop_sent = False
+
+    def enqueue(self, steps):
+        for step in steps:
+            self.queue.put(step)
+
+    def start(self):
+        if self.running or self.busy:
+            return
+        self.running = True
+        self.aborted = None
+        self.stop_sent = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def busy(self):
+        # The worker may still be waiting on a reply after running went False
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self, timeout=None):
+        if self.busy and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        return not self.busy or self.thread is threading.current_thread()
+
+    def abort(self, reason):
+        with self.lock:
+            if not self.running:
+                return
+            self.aborted = reason
+            self.running = False
+            self.stop_sent = True
+        print(f"Mission aborted: {reason}")
+        # 'stop' interrupts a go/curve in progress and hovers in place. The worker thread may be waiting on
+        # the current command, so it collects the stop's reply itself before it exits
+        self.tello.send_command_without_return('stop')
+
+    def collect_reply(self, timeout):
+        # djitellopy keeps one reply queue per drone; an unread reply would be taken by the next command
+        # as its own. The simulator answers inline and has no queue
+        own = getattr(self.tello, 'get_own_udp_object', None)
+        if own is None:
+            return
+        responses = own()['responses']
+        deadline = time.monotonic() + timeout
+        while not responses and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if responses:
+            responses.pop(0)
+
+    def check_battery(self):
+        if self.running and self.tello.get_battery() < self.min_battery:
+            self.abort(f"battery below {self.min_battery}%")
+
+    def send(self, command, timeout):
+        # One send per attempt; send_control_command would resend on its own, even after an abort's 'stop'.
+        # Only an explicit error reply is retried: the drone refused, so the leg was not flown. A lost reply
+        # is not, the leg may be under way
+        for attempt in range(self.retries + 1):
+            if not self.running:
+                return
+            response = self.tello.send_command_with_return(command, timeout=timeout)
+            if response.lower() == 'ok':
+                return
+            if response.startswith('Aborting command'):
+                raise MissionError(response)
+            if not self.running:
+                # The abort's 'stop' cut the leg short, that is the error reply
+                return
+            print(f"{command}: {response}, attempt {attempt + 1} of {self.retries + 1}")
+        raise MissionError(f"drone replied {response!r}")
+
+    def _run(self):
+        while self.running:
+            try:
+                step = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.current = step
+            name, command, seconds = step
+            self.check_battery()
+            if not self.running:
+                break
+
+            if name == 'wait':
+                deadline = time.monotonic() + seconds
+                while self.running and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            else:
+                try:
+                    self.send(command, max(seconds, self.tello.TAKEOFF_TIMEOUT))
+                except Exception as e:
+                    self.abort(f"{command} failed: {e}")
+                    break
+                if not self.running:
+                    break
+                if name == 'takeoff':
+                    self.tello.is_flying = True
+                elif name == 'land':
+                    self.tello.is_flying = False
+            self.completed += 1
+
+        self.current = None
+        with self.lock:
+            self.running = False
+            stop_sent = self.stop_sent
+        if stop_sent:
+            self.collect_reply(self.tello.RESPONSE_TIMEOUT)
+        if self.on_finish is not None:
+            self.on_finish(self.aborted)
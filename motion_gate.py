@@ -0,0 +1,74 @@
+import time
+import cv2
+from frame_context import FrameContext
+
+
+class MotionGate:
+    # Decides per frame whether an expensive stage needs to run. The frame is compared at quarter
+    # resolution with the one the stage last processed (not just the previous frame, so slow drift
+    # still adds up); any recent RC command counts as motion because the camera is about to move
+    def __init__(self, roi_threshold=3.0, frame_threshold=2.0, max_skip=15, rc_threshold=5, rc_hold=0.5, margin=0.25,
+                 clock=time.monotonic):
+        self.roi_threshold = roi_threshold
+        self.frame_threshold = frame_threshold
+        self.max_skip = max_skip
+        self.rc_threshold = rc_threshold
+        self.rc_hold = rc_hold
+        self.margin = margin
+        self.clock = clock
+
+        self.reference = None
+        self.skipped_in_row = 0
+        self.last_motion_command = None
+        self.processed = 0
+        self.skipped = 0
+
+    def reset(self):
+        # Next frame always runs, e.g. after the stage was re-initialised
+        self.reference = None
+        self.skipped_in_row = 0
+
+    def note_command(self, left_right, for_back, up_down, yaw):
+        if max(abs(left_right), abs(for_back), abs(up_down), abs(yaw)) > self.rc_threshold:
+            self.last_motion_command = self.clock()
+
+    def commanded_motion(self):
+        # The drone keeps moving for a moment after the sticks are released
+        return self.last_motion_command is not None and self.clock() - self.last_motion_command < self.rc_hold
+
+    def changes(self, small, box, scale):
+        diff = cv2.absdiff(small, self.reference)
+        frame_change = float(diff.mean())
+        if box is None:
+            return frame_change, frame_change
+        # The box plus a margin, so a target starting to leave it shows up as well
+        x, y, w, h = [v * scale for v in box]
+        mx, my = w * self.margin, h * self.margin
+        x0, y0 = max(int(x - mx), 0), max(int(y - my), 0)
+        x1, y1 = min(int(x + w + mx) + 1, diff.shape[1]), min(int(y + h + my) + 1, diff.shape[0])
+        roi = diff[y0:y1, x0:x1]
+        return frame_change, float(roi.mean()) if roi.size else frame_change
+
+    def should_process(self, frame, box=None):
+        small = FrameContext.wrap(frame).gray_quarter
+        scale = small.shape[1] / frame.shape[1]
+        run = (self.reference is None or self.reference.shape != small.shape
+               or self.skipped_in_row >= self.max_skip or self.commanded_motion())
+        if not run:
+            frame_change, roi_change = self.changes(small, box, scale)
+            run = frame_change > self.frame_threshold or roi_change > self.roi_threshold
+
+        if run:
+            # Own copy: the context's view goes back to the pool with the frame
+            self.reference = small.copy()
+            self.skipped_in_row = 0
+            self.processed += 1
+        else:
+            self.skipped_in_row += 1
+            self.skipped += 1
+        return run
+
+    @property
+    def skip_ratio(self):
+        total = self.processed + self.skipped
+        return self.skipped / total if total else 0.0
@@ -1,4 +1,5 @@
 import os
+import time
 import cv2
 import numpy as np
 import argparse
@@ -6,6 +7,9 @@ import tkinter as tk
 from PIL import Image, ImageTk
 from djitellopy import Tello
 from pynput import keyboard
+from frame_source import DroneFrameSource, WebcamFrameSource
+from clip_buffer import PreTriggerBuffer
+from roi_select import StreamSelector
 
 WIDTH, HEIGHT = 640, 480
 FPS = 30
@@ -29,10 +33,12 @@ class RyzeTelloApp:
             self.use_drone = False
 
         # Якщо не підключено до дрона, використовуємо веб-камеру
-        if not self.use_drone:
-            self.vid = cv2.VideoCapture(0)  # Камера ноутбука
-            self.vid.set(cv2.CAP_PROP_FRAME_WIDTH, WIDTH)
-            self.vid.set(cv2.CAP_PROP_FRAME_HEIGHT, HEIGHT)
+        if self.use_drone:
+            self.source = DroneFrameSource(self.tello, WIDTH, HEIGHT)
+        else:
+            self.source = WebcamFrameSource(0, WIDTH, HEIGHT)  # Камера ноутбука
+        self.source.start()
+        self.last_seq = 0
 
         # Параметри для запису відео
         self.is_recording = False
@@ -43,10 +49,21 @@ class RyzeTelloApp:
         self.canvas = tk.Canvas(window, width=WIDTH, height=HEIGHT)
         self.canvas.pack()
 
+        # Вибір об'єкта кліком або рамкою прямо на відео, без зупинки потоку
+        self.selector = StreamSelector()
+        self.canvas.bind('<ButtonPress-1>', lambda e: self.selector.press(e.x, e.y))
+        self.canvas.bind('<B1-Motion>', lambda e: self.selector.move(e.x, e.y))
+        self.canvas.bind('<ButtonRelease-1>', lambda e: self.selector.release(e.x, e.y))
+
         # Кнопка для запису/зупинки відео
         self.btn_video = tk.Button(window, text="Почати запис", width=50, command=self.toggle_recording)
         self.btn_video.pack(anchor=tk.CENTER, expand=True)
 
+        # Останні секунди в пам'яті: кліп "до і після" натискання
+        self.ring = PreTriggerBuffer(fps=FPS)
+        self.btn_clip = tk.Button(window, text="Зберегти кліп (V)", width=50, command=self.save_clip)
+        self.btn_clip.pack(anchor=tk.CENTER, expand=True)
+
         # Затримка оновлення відео
         self.delay = 10
 
@@ -73,18 +90,6 @@ class RyzeTelloApp:
         # Запуск головного вікна
         self.window.mainloop()
 
-    def get_frame(self):
-        if self.use_drone:
-            frame = self.tello.get_frame_read().frame
-            resized_frame = cv2.resize(frame, (WIDTH, HEIGHT))
-        else:
-            ret, frame = self.vid.read()
-            if ret:
-                resized_frame = cv2.resize(frame, (WIDTH, HEIGHT))
-            else:
-                resized_frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
-        return resized_frame
-
     def toggle_recording(self):
         # Якщо вже записуємо відео - зупиняємо запис
         if self.is_recording:
@@ -99,8 +104,27 @@ class RyzeTelloApp:
             self.out = cv2.VideoWriter(self.save_path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
             print("Почався запис відео")
 
+    def save_clip(self, before=10.0, after=5.0):
+        path = time.strftime("clip_%Y%m%d_%H%M%S.mp4")
+        self.ring.export_clip(path, before, after)
+        print(f"Зберігаємо кліп: {before} с до і {after} с після")
+
     def update(self):
-        frame = self.get_frame()
+        item = self.source.latest_frame()
+        if item is None or item.seq == self.last_seq:
+            # Нового кадру ще немає
+            self.window.after(self.delay, self.update)
+            return
+        self.last_seq = item.seq
+        frame = item.image.copy()
+
+        self.selector.set_frame(item.image)
+        box = self.selector.poll()
+        if box is not None:
+            self.BB = box
+            self.tracker = cv2.TrackerKCF_create()
+            self.tracker.init(frame, self.BB)
+            self.tracking = True
 
         if self.tracking and self.BB is not None:
             success, box = self.tracker.update(frame)
@@ -113,6 +137,7 @@ class RyzeTelloApp:
 
         # Малюємо crosshair
         self.draw_crosshair(frame)
+        self.selector.draw(frame)
 
         if self.use_drone:
             # Відображаємо батарею, якщо підключено до дрона
@@ -125,6 +150,7 @@ class RyzeTelloApp:
         # Записуємо кадр у файл, якщо запис триває
         if self.is_recording:
             self.out.write(frame)
+        self.ring.push(frame, item.timestamp)
 
         # Оновлення через затримку
         self.window.after(self.delay, self.update)
@@ -144,17 +170,11 @@ class RyzeTelloApp:
                 # Вихід з програми при натисканні Q
                 self.window.quit()
                 return False  # Зупиняє слухач клавіатури
+            elif key.char == 'v':
+                self.save_clip()
             elif key.char == 'c':
-                # Активуємо режим трекінгу при натисканні C
-                frame = self.get_frame()
-                if frame is not None:
-                    self.BB = cv2.selectROI("Select Object", frame, fromCenter=False, showCrosshair=True)
-                    if self.BB[2] > 0 and self.BB[3] > 0:  # Переконаємося, що ROI має ненульову ширину та висоту
-                        self.tracker.init(frame, self.BB)
-                        self.tracking = True
-                        cv2.destroyWindow("Select Object")
-                    else:
-                        print("ROI не вибрано")
+                # Активуємо режим трекінгу при натисканні C: далі клік або рамка на відео
+                self.selector.arm()
 
             # Управління рухом з клавішами
             if key.char == 'w':
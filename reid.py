@@ -0,0 +1,144 @@
+import cv2
+import numpy as np
+from frame_context import FrameContext
+
+FLANN_LSH = dict(algorithm=6, table_number=6, key_size=12, multi_probe_level=1)
+
+
+class TargetReID:
+    # Appearance model of the tracked target (ORB descriptors from several views in an LSH index)
+    # used to find it again after the tracker loses it
+    def __init__(self, max_views=8, learn_every=15, min_inliers=10, ratio=0.75, max_attempts=4, idle_every=5):
+        self.max_views = max_views
+        self.learn_every = learn_every
+        self.min_inliers = min_inliers
+        self.ratio = ratio
+        self.max_attempts = max_attempts
+        self.idle_every = idle_every
+
+        self.orb = cv2.ORB_create(nfeatures=300, scaleFactor=1.2, nlevels=6, edgeThreshold=15, patchSize=15)
+        self.matcher = None
+        self.views = []
+
+        self.frames_since_learn = 0
+        self.last_box = None
+        self.lost_frames = 0
+
+    def reset(self):
+        self.views = []
+        self.matcher = None
+        self.last_box = None
+        self.lost_frames = 0
+
+    def learn(self, frame, box, force=False):
+        # Called on every successful track; only every learn_every-th frame adds a view
+        self.last_box = tuple(box)
+        self.lost_frames = 0
+        self.frames_since_learn += 1
+        if not force and self.frames_since_learn < self.learn_every:
+            return False
+        self.frames_since_learn = 0
+
+        gray = FrameContext.wrap(frame).gray
+        x, y, w, h = [int(v) for v in box]
+        x0, y0 = max(x, 0), max(y, 0)
+        patch = gray[y0:y + h, x0:x + w]
+        if patch.shape[0] < 16 or patch.shape[1] < 16:
+            return False
+        keypoints, descriptors = self.orb.detectAndCompute(patch, None)
+        if descriptors is None or len(keypoints) < self.min_inliers:
+            return False
+
+        # Keypoints relative to the box origin, so a match maps straight back to a box
+        points = np.float32([kp.pt for kp in keypoints]) + np.float32([x0 - x, y0 - y])
+        self.views.append((points, descriptors, (w, h)))
+        if len(self.views) > self.max_views:
+            # Keep the first (operator-selected) view, drop the oldest learned one
+            del self.views[1]
+        self.rebuild_index()
+        return True
+
+    def rebuild_index(self):
+        self.matcher = cv2.FlannBasedMatcher(FLANN_LSH, dict(checks=32))
+        self.matcher.add([descriptors for _, descriptors, _ in self.views])
+        self.matcher.train()
+
+    def search(self, frame):
+        # Returns a verified box or None; call once per frame while the target is lost
+        if self.matcher is None:
+            return None
+        self.lost_frames += 1
+        attempt = self.lost_frames - 1
+        if attempt >= self.max_attempts and attempt % self.idle_every:
+            # Long gone: only look every few frames so an empty view costs little
+            return None
+
+        context = FrameContext.wrap(frame)
+        gray = context.gray
+        frame_h, frame_w = gray.shape[:2]
+        region = self.search_region(min(attempt, self.max_attempts), frame_w, frame_h)
+
+        # Coarse: big regions are searched at half resolution
+        x, y, w, h = region
+        coarse = w * h > frame_w * frame_h // 4
+        if coarse:
+            box = self.match(context.gray_half, (x // 2, y // 2, w // 2, h // 2), 0.5)
+            if box is None:
+                return None
+            # Fine: verify at full resolution around the coarse hit
+            bx, by, bw, bh = box
+            region = self.clip((bx - bw // 2, by - bh // 2, bw * 2, bh * 2), frame_w, frame_h)
+        box = self.match(gray, region, 1.0)
+        if box is not None:
+            self.last_box = box
+            self.lost_frames = 0
+        return box
+
+    def search_region(self, attempt, frame_w, frame_h):
+        if self.last_box is None or attempt >= self.max_attempts:
+            return (0, 0, frame_w, frame_h)
+        # Expanding window around where the target was last seen
+        x, y, w, h = self.last_box
+        grow = 2 ** (attempt + 1)
+        cx, cy = x + w / 2, y + h / 2
+        w, h = w * grow, h * grow
+        return self.clip((int(cx - w / 2), int(cy - h / 2), int(w), int(h)), frame_w, frame_h)
+
+    def clip(self, region, frame_w, frame_h):
+        x, y, w, h = [int(v) for v in region]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+        return (x0, y0, max(x1 - x0, 0), max(y1 - y0, 0))
+
+    def match(self, gray, region, scale):
+        x, y, w, h = region
+        if w < 16 or h < 16:
+            return None
+        keypoints, descriptors = self.orb.detectAndCompute(gray[y:y + h, x:x + w], None)
+        if descriptors is None or len(keypoints) < self.min_inliers:
+            return None
+
+        by_view = {}
+        for pair in self.matcher.knnMatch(descriptors, k=2):
+            if len(pair) == 2 and pair[0].distance < self.ratio * pair[1].distance:
+                by_view.setdefault(pair[0].imgIdx, []).append(pair[0])
+        if not by_view:
+            return None
+
+        view_idx, matches = max(by_view.items(), key=lambda item: len(item[1]))
+        if len(matches) < self.min_inliers:
+            return None
+        model_points, _, (view_w, view_h) = self.views[view_idx]
+        src = np.float32([model_points[m.trainIdx] for m in matches])
+        dst = np.float32([keypoints[m.queryIdx].pt for m in matches]) + np.float32([x, y])
+
+        # Geometric verification: the matches must agree on one similarity transform
+        transform, inliers = cv2.estimateAffinePartial2D(src, dst, method=cv2.RANSAC, ransacReprojThreshold=4.0)
+        if transform is None or inliers.sum() < self.min_inliers:
+            return None
+        s = np.hypot(transform[0, 0], transform[1, 0])
+        if not 0.2 < s / scale < 5.0:
+            return None
+        cx, cy = transform @ np.array([view_w / 2, view_h / 2, 1.0])
+        w, h = view_w * s, view_h * s
+        return tuple(int(round(v / scale)) for v in (cx - w / 2, cy - h / 2, w, h))
@@ -0,0 +1,114 @@
+import threading
+import cv2
+import numpy as np
+
+DRAG_THRESHOLD = 6
+
+
+def snap_box(frame, x, y, radius=80, default=60):
+    # Box proposal around a click: the contour under (or nearest to) the point in a local edge map
+    h, w = frame.shape[:2]
+    x0, y0 = max(x - radius, 0), max(y - radius, 0)
+    x1, y1 = min(x + radius, w), min(y + radius, h)
+    patch = frame[y0:y1, x0:x1]
+    gray = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY) if patch.ndim == 3 else patch
+
+    edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 40, 120)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    point = (float(x - x0), float(y - y0))
+    best, best_score = None, None
+    min_area = 0.01 * patch.shape[0] * patch.shape[1]
+    for contour in contours:
+        bx, by, bw, bh = cv2.boundingRect(contour)
+        if bw * bh < min_area or bw >= patch.shape[1] - 2 and bh >= patch.shape[0] - 2:
+            continue
+        # Inside the contour scores best, otherwise by distance to it
+        score = -cv2.pointPolygonTest(contour, point, True)
+        if best_score is None or score < best_score:
+            best, best_score = (bx, by, bw, bh), score
+
+    if best is None or best_score > default / 2:
+        half = default // 2
+        return (int(np.clip(x - half, 0, w - default)), int(np.clip(y - half, 0, h - default)), default, default)
+    bx, by, bw, bh = best
+    return (bx + x0, by + y0, bw, bh)
+
+
+class StreamSelector:
+    # Click-to-track or drag-select on a live view; never blocks the loop that feeds it
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.armed = False
+        self.frame = None
+        self.start = None
+        self.current = None
+        self.selected = None
+
+    def arm(self):
+        with self.lock:
+            self.armed = True
+            self.start = self.current = None
+
+    def cancel(self):
+        with self.lock:
+            self.armed = False
+            self.start = self.current = None
+
+    def set_frame(self, frame):
+        # Clean frame (no overlays) the click snap is computed on
+        self.frame = frame
+
+    def attach(self, window_name):
+        cv2.setMouseCallback(window_name, self.on_mouse)
+
+    def on_mouse(self, event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:
+            self.press(x, y)
+        elif event == cv2.EVENT_MOUSEMOVE and flags & cv2.EVENT_FLAG_LBUTTON:
+            self.move(x, y)
+        elif event == cv2.EVENT_LBUTTONUP:
+            self.release(x, y)
+
+    def press(self, x, y):
+        with self.lock:
+            if self.armed:
+                self.start = self.current = (x, y)
+
+    def move(self, x, y):
+        with self.lock:
+            if self.start is not None:
+                self.current = (x, y)
+
+    def release(self, x, y):
+        with self.lock:
+            if self.start is None:
+                return
+            sx, sy = self.start
+            self.start = self.current = None
+            if abs(x - sx) < DRAG_THRESHOLD and abs(y - sy) < DRAG_THRESHOLD:
+                frame = self.frame
+                box = snap_box(frame, x, y) if frame is not None else None
+            else:
+                box = (min(x, sx), min(y, sy), abs(x - sx), abs(y - sy))
+            if box is not None and box[2] > 0 and box[3] > 0:
+                self.selected = tuple(int(v) for v in box)
+                self.armed = False
+
+    def poll(self):
+        # The finished selection, handed out once
+        with self.lock:
+            box, self.selected = self.selected, None
+            return box
+
+    def draw(self, frame):
+        with self.lock:
+            armed, start, current = self.armed, self.start, self.current
+        if not armed:
+            return
+        if start is not None and current is not None:
+            cv2.rectangle(frame, start, current, (0, 255, 0), 2)
+        else:
+            cv2.putText(frame, 'Click or drag to select target', (30, frame.shape[0] - 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
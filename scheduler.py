@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import cv2
+
+STAGES = ('control', 'decode', 'vision', 'io')
+
+
+def available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_cores(cores, decode_cores=None):
+    # control: one core of its own. vision: the OpenCV pool, which includes the calling (control) thread.
+    # decode: the last core(s), away from the pool. io: JPEG encoding, receivers, web clients; everything but control
+    n = len(cores)
+    if n == 1:
+        return {stage: list(cores) for stage in STAGES}
+    if decode_cores is None:
+        decode_cores = 1 if n < 6 else 2
+    decode_cores = min(max(decode_cores, 1), n - 1)
+    decode = cores[n - decode_cores:]
+    vision = cores[:n - decode_cores]
+    return {'control': cores[:1], 'decode': decode, 'vision': vision, 'io': cores[1:]}
+
+
+class CoreScheduler:
+    # Thread budgets per pipeline stage so OpenCV's pool, the PyAV decoder and the app threads
+    # don't oversubscribe the cores. Affinity pinning and thread priorities are Linux-only extras
+    def __init__(self, cores=None, decode_cores=None, pin=False, control_nice=-5, io_nice=5):
+        self.cores = sorted(cores) if cores is not None else available_cores()
+        self.sets = plan_cores(self.cores, decode_cores)
+        self.pin = pin and hasattr(os, 'sched_setaffinity')
+        self.control_nice = control_nice
+        self.io_nice = io_nice
+        self.raise_failed = False
+        if pin and not self.pin:
+            print("CPU affinity is not supported on this platform, only thread counts are applied")
+
+    def threads(self, stage):
+        return len(self.sets[stage])
+
+    def apply(self):
+        # Before the first tracker is created, so its pool starts at the right size
+        cv2.setNumThreads(self.threads('vision'))
+        print("Thread plan: " + ", ".join(f"{stage} {self.sets[stage]}" for stage in STAGES))
+
+    def configure_decoder(self, container):
+        # Slice threads add no frame delay, unlike frame threading; right for a live stream
+        for stream in container.streams.video:
+            stream.thread_type = 'SLICE'
+            stream.thread_count = self.threads('decode')
+
+    def assign(self, stage, thread=None):
+        # Pins a running thread (the calling one by default) to its stage's cores and sets its priority
+        tid = thread.native_id if thread is not None else threading.get_native_id()
+        if tid is None:
+            return False
+        if self.pin:
+            try:
+                os.sched_setaffinity(tid, self.sets[stage])
+            except OSError as e:
+                print(f"Could not pin {stage} thread: {e}")
+        if stage == 'control':
+            self.nice(tid, self.control_nice)
+        elif stage == 'io':
+            self.nice(tid, self.io_nice)
+        return True
+
+    def assign_process(self, pid, stage):
+        if self.pin:
+            try:
+                os.sched_setaffinity(pid, self.sets[stage])
+            except OSError as e:
+                print(f"Could not pin {stage} process: {e}")
+
+    def thread_init(self, stage):
+        # For ThreadPoolExecutor(initializer=...)
+        return lambda: self.assign(stage)
+
+    def nice(self, tid, value):
+        # On Linux a thread id is a valid PRIO_PROCESS target. Going below 0 needs CAP_SYS_NICE;
+        # without it the io threads are still lowered, which helps the control thread nearly as much
+        if not value or not sys.platform.startswith('linux') or value < 0 and self.raise_failed:
+            return
+        try:
+            os.setpriority(os.PRIO_PROCESS, tid, value)
+        except OSError as e:
+            if value < 0:
+                self.raise_failed = True
+            print(f"Could not set thread priority {value}: {e}")
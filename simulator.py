@@ -0,0 +1,510 @@
+import math
+import time
+import logging
+import argparse
+import threading
+from collections import deque
+import cv2
+import numpy as np
+from djitellopy.tello import TelloException
+from markers import camera_matrix
+from trackers import TRACKERS, create_tracker
+from controller import TargetFollower
+from motion_gate import MotionGate
+
+# RC value 100 in cm/s and deg/s, first-order response time constants in seconds
+MAX_SPEED = 100.0
+MAX_YAW_RATE = 90.0
+TAU_MOVE = 0.35
+TAU_YAW = 0.15
+TAKEOFF_HEIGHT = 80.0
+BATTERY_DRAIN = 100.0 / (13 * 60)  # per second of flight
+
+
+def default_target_path(t):
+    # Wanders left/right and closer/further in front of the takeoff point; world x east, y north, z up (cm)
+    return (150 * math.sin(0.21 * t) + 60 * math.sin(0.53 * t),
+            300 + 80 * math.sin(0.17 * t),
+            100 + 20 * math.sin(0.31 * t))
+
+
+def hover_target_path(t):
+    # Subject standing still in front of the takeoff point
+    return (0.0, 300.0, 100.0)
+
+
+SCENES = {'wander': default_target_path, 'hover': hover_target_path}
+
+
+def make_texture(width, height, seed, blobs=40):
+    # Smooth colour noise with sharp shapes on top, so both correlation and keypoint trackers have something to hold
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (max(height // 24, 2), max(width // 24, 2), 3), dtype=np.uint8)
+    image = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    for _ in range(blobs):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        size = int(rng.integers(4, max(min(width, height) // 8, 5)))
+        if rng.random() < 0.5:
+            cv2.rectangle(image, (x, y), (x + size, y + size), color, -1)
+        else:
+            cv2.circle(image, (x, y), size // 2, color, -1)
+    return image
+
+
+class SimFrameRead:
+    # Stands in for BackgroundFrameRead: every read of .frame is the next rendered frame
+    def __init__(self, sim):
+        self.sim = sim
+        self.stopped = False
+
+    @property
+    def frame(self):
+        return self.sim.next_frame()
+
+    def stop(self):
+        self.stopped = True
+
+
+class SimTello:
+    # Kinematic Tello with a camera looking at a moving textured target.
+    # realtime=False steps the simulated clock by one frame per read, so a loop runs as fast as the CPU allows
+    LOGGER = logging.getLogger('simtello')
+    TAKEOFF_TIMEOUT = 20
+    RESPONSE_TIMEOUT = 7
+
+    def __init__(self, width=960, height=720, fps=30, realtime=False, latency=0.05, seed=0,
+                 target_path=default_target_path, target_size=(60, 90), texture=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.dt = 1.0 / fps
+        self.realtime = realtime
+        self.latency = latency
+        self.target_path = target_path
+        self.target_size = target_size
+
+        camera = camera_matrix(width, height)
+        self.fx, self.cx, self.cy = camera[0, 0], camera[0, 2], camera[1, 2]
+        # Distant background as a cylinder around the drone; yaw scrolls it
+        self.panorama = make_texture(int(round(2 * math.pi * self.fx)), height, seed, blobs=400)
+        if texture is None:
+            texture = make_texture(target_size[0] * 4, target_size[1] * 4, seed + 1)
+        self.texture = texture
+        th, tw = texture.shape[:2]
+        self.texture_corners = np.float32([[0, 0], [tw, 0], [tw, th], [0, th]])
+
+        self.lock = threading.Lock()
+        self.background_frame_read = None
+        self.stream_on = False
+        self.is_flying = False
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.time = 0.0
+            self.wall = None
+            self.position = np.zeros(3)
+            self.velocity = np.zeros(3)  # body frame: right, forward, up
+            self.yaw = 0.0
+            self.yaw_rate = 0.0
+            self.rc = (0, 0, 0, 0)
+            self.pending = deque()
+            self.interrupts = 0
+            self.battery = 100.0
+            self.flight_time = 0.0
+            self.frame = None
+            self.truth = None
+            self.is_flying = False
+
+    # Dynamics
+
+    def step(self, dt):
+        while self.pending and self.pending[0][0] <= self.time:
+            self.rc = self.pending.popleft()[1]
+        self.time += dt
+        if not self.is_flying:
+            return
+        lr, fb, ud, yaw = self.rc
+        move = 1 - math.exp(-dt / TAU_MOVE)
+        self.velocity += (np.array([lr, fb, ud]) * MAX_SPEED / 100 - self.velocity) * move
+        self.yaw_rate += (yaw * MAX_YAW_RATE / 100 - self.yaw_rate) * (1 - math.exp(-dt / TAU_YAW))
+        self.yaw = (self.yaw + self.yaw_rate * dt + 180) % 360 - 180
+
+        forward, right = self.axes()
+        self.position[:2] += (right * self.velocity[0] + forward * self.velocity[1]) * dt
+        self.position[2] = max(self.position[2] + self.velocity[2] * dt, 20.0)
+        self.battery = max(self.battery - BATTERY_DRAIN * dt, 0.0)
+        self.flight_time += dt
+
+    def axes(self):
+        # Yaw 0 faces north (+y), positive yaw turns clockwise like the Tello's 'cw'
+        a = math.radians(self.yaw)
+        return np.array([math.sin(a), math.cos(a)]), np.array([math.cos(a), -math.sin(a)])
+
+    def advance(self, seconds):
+        self.fly_until(lambda elapsed: elapsed >= seconds)
+
+    def fly_until(self, done):
+        # Runs the dynamics until done(elapsed simulated seconds) holds; realtime mode paces it to the wall clock
+        start = self.time
+        while True:
+            with self.lock:
+                if done(self.time - start):
+                    return
+                if not self.realtime:
+                    self.step(self.dt)
+                    continue
+            time.sleep(self.dt)
+            with self.lock:
+                self.sync()
+
+    def sync(self):
+        # Realtime mode: catch the simulated clock up with the wall clock, whole frames at a time
+        now = time.perf_counter()
+        if self.wall is None:
+            self.wall = now
+        steps = int((now - self.wall) / self.dt)
+        self.wall += steps * self.dt
+        if now - self.wall > 1.0:
+            self.wall = now  # stalled caller, don't replay the gap
+        for _ in range(min(steps, self.fps)):
+            self.step(self.dt)
+        return steps > 0
+
+    # Rendering
+
+    def project(self, points):
+        forward, right = self.axes()
+        d = points[:, :2] - self.position[:2]
+        depth = d @ forward
+        if np.any(depth < 20):
+            return None
+        u = self.fx * (d @ right) / depth + self.cx
+        v = self.fx * (self.position[2] - points[:, 2]) / depth + self.cy
+        return np.float32(np.stack([u, v], axis=1))
+
+    def render(self):
+        start = int(round(math.radians(self.yaw) * self.fx)) - self.width // 2
+        columns = (start + np.arange(self.width)) % self.panorama.shape[1]
+        frame = self.panorama[:, columns]
+
+        # The target turns to face the drone about its vertical axis, so only its outline changes with the view
+        center = np.array(self.target_path(self.time), dtype=np.float64)
+        facing = self.position[:2] - center[:2]
+        facing /= max(np.linalg.norm(facing), 1e-6)
+        side = np.array([-facing[1], facing[0]]) * self.target_size[0] / 2
+        up = self.target_size[1] / 2
+        corners = np.array([[center[0] - side[0], center[1] - side[1], center[2] + up],
+                            [center[0] + side[0], center[1] + side[1], center[2] + up],
+                            [center[0] + side[0], center[1] + side[1], center[2] - up],
+                            [center[0] - side[0], center[1] - side[1], center[2] - up]])
+        quad = self.project(corners)
+        self.truth = None
+        if quad is None:
+            return frame
+
+        x0, y0 = np.maximum(np.floor(quad.min(axis=0)).astype(int), 0)
+        x1, y1 = np.minimum(np.ceil(quad.max(axis=0)).astype(int), [self.width, self.height])
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return frame
+        # Warp only into the target's bounding box
+        local = quad - np.float32([x0, y0])
+        matrix = cv2.getPerspectiveTransform(self.texture_corners, local)
+        patch = cv2.warpPerspective(self.texture, matrix, (x1 - x0, y1 - y0), flags=cv2.INTER_LINEAR)
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillConvexPoly(mask, np.round(local).astype(np.int32), 1)
+        np.copyto(frame[y0:y1, x0:x1], patch, where=mask[..., None].astype(bool))
+        self.truth = (int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+        return frame
+
+    def next_frame(self):
+        with self.lock:
+            if self.realtime:
+                if not self.sync() and self.frame is not None:
+                    # Same object until the next frame is due, like the real decoder thread
+                    return self.frame
+            else:
+                self.step(self.dt)
+            self.frame = self.render()
+            return self.frame
+
+    def target_box(self):
+        # Ground-truth box of the target in the last rendered frame, None when out of view
+        return self.truth
+
+    # Tello API
+
+    def connect(self, wait_for_state=True):
+        pass
+
+    def end(self):
+        if self.is_flying:
+            self.land()
+        self.streamoff()
+
+    def streamon(self):
+        self.stream_on = True
+
+    def streamoff(self):
+        self.stream_on = False
+        if self.background_frame_read is not None:
+            self.background_frame_read.stop()
+            self.background_frame_read = None
+
+    def get_frame_read(self, with_queue=False, max_queue_len=32):
+        if self.background_frame_read is None:
+            self.background_frame_read = SimFrameRead(self)
+        return self.background_frame_read
+
+    def takeoff(self):
+        with self.lock:
+            self.is_flying = True
+            self.position[2] = TAKEOFF_HEIGHT
+            self.velocity[:] = 0
+
+    def land(self):
+        with self.lock:
+            # Ends a move in progress, like 'stop'
+            self.interrupts += 1
+            self.is_flying = False
+            self.position[2] = 0.0
+            self.velocity[:] = 0
+            self.yaw_rate = 0.0
+            self.rc = (0, 0, 0, 0)
+            self.pending.clear()
+
+    def send_rc_control(self, left_right_velocity, forward_backward_velocity, up_down_velocity, yaw_velocity):
+        rc = tuple(int(np.clip(v, -100, 100)) for v in
+                   (left_right_velocity, forward_backward_velocity, up_down_velocity, yaw_velocity))
+        with self.lock:
+            # Takes effect after the radio/controller latency
+            self.pending.append((self.time + self.latency, rc))
+
+    def send_command_without_return(self, command):
+        self.send_command_with_return(command)
+
+    def send_control_command(self, command, timeout=RESPONSE_TIMEOUT):
+        response = self.send_command_with_return(command, timeout)
+        if response != 'ok':
+            raise TelloException(f"Command '{command}' was unsuccessful: {response}")
+        return True
+
+    def send_command_with_return(self, command, timeout=RESPONSE_TIMEOUT):
+        # SDK text commands used by missions and the marker modes. Moves are flown closed-loop at the
+        # commanded speed and end early on 'stop', like the drone's; anything else is refused
+        parts = command.split()
+        name = parts[0]
+        try:
+            args = [float(v) for v in parts[1:]]
+        except ValueError:
+            args = None
+        moves = {'forward': (1, 0, 0), 'back': (-1, 0, 0), 'left': (0, 1, 0), 'right': (0, -1, 0),
+                 'up': (0, 0, 1), 'down': (0, 0, -1)}
+        if args is None:
+            return f"error Not supported by the simulator: {command}"
+        if name in ('command', 'streamon', 'streamoff') and not args:
+            return 'ok'
+        if name in ('takeoff', 'land', 'stop', 'emergency') and not args:
+            if name == 'takeoff':
+                self.takeoff()
+            elif name == 'land':
+                self.land()
+            else:
+                with self.lock:
+                    # Ends a move in progress
+                    self.interrupts += 1
+                    self.pending.clear()
+                    self.rc = (0, 0, 0, 0)
+                if name == 'emergency':
+                    self.land()
+            return 'ok'
+        if not self.is_flying:
+            return 'error Not in flight'
+        if name in moves and len(args) == 1:
+            return self.fly_legs([np.array(moves[name]) * args[0]], MAX_SPEED, timeout)
+        if name in ('cw', 'ccw') and len(args) == 1:
+            return self.turn(args[0] if name == 'cw' else -args[0], timeout)
+        if name == 'go' and len(args) == 4:
+            return self.fly_legs([np.array(args[:3])], args[3], timeout)
+        if name == 'curve' and len(args) == 7:
+            # The arc is flown as the two chords through its mid point
+            first, end = np.array(args[:3]), np.array(args[3:6])
+            return self.fly_legs([first, end - first], args[6], timeout)
+        return f"error Not supported by the simulator: {command}"
+
+    def fly_legs(self, legs, speed, timeout):
+        # legs: displacements in the body frame as the SDK gives them, x forward, y left, z up (cm)
+        deadline = self.time + timeout
+        for leg in legs:
+            distance = float(np.linalg.norm(leg))
+            if distance == 0:
+                continue
+            stick = np.array([-leg[1], leg[0], leg[2]]) / distance * min(speed / MAX_SPEED, 1.0) * 100
+            with self.lock:
+                interrupts = self.interrupts
+                self.pending.clear()
+                self.rc = (int(stick[0]), int(stick[1]), int(stick[2]), 0)
+                start = self.position.copy()
+                forward, right = self.axes()
+                direction = np.append(forward * leg[0] - right * leg[1], leg[2]) / distance
+
+            def done(elapsed):
+                # Cut the stick when what the lag will still carry covers the rest
+                progress = (self.position - start) @ direction + np.linalg.norm(self.velocity) * TAU_MOVE
+                return progress >= distance or self.interrupts != interrupts or self.time > deadline
+
+            self.fly_until(done)
+            with self.lock:
+                if self.interrupts != interrupts:
+                    return 'error Interrupted'
+                self.rc = (0, 0, 0, 0)
+            if self.time > deadline:
+                return 'error Timeout'
+        return 'ok'
+
+    def turn(self, angle, timeout):
+        with self.lock:
+            interrupts = self.interrupts
+            self.pending.clear()
+            self.rc = (0, 0, 0, 100 if angle > 0 else -100)
+            last = self.yaw
+        turned = 0.0
+
+        def done(elapsed):
+            # Summed per step, so turns past 180 degrees are measured through the wrap
+            nonlocal last, turned
+            turned += abs((self.yaw - last + 180) % 360 - 180)
+            last = self.yaw
+            progress = turned + abs(self.yaw_rate) * TAU_YAW
+            return progress >= abs(angle) or self.interrupts != interrupts or elapsed > timeout
+
+        self.fly_until(done)
+        with self.lock:
+            if self.interrupts != interrupts:
+                return 'error Interrupted'
+            self.rc = (0, 0, 0, 0)
+        return 'ok'
+
+    def get_current_state(self):
+        with self.lock:
+            forward, right = self.axes()
+            world = right * self.velocity[0] + forward * self.velocity[1]
+            return {'pitch': 0, 'roll': 0, 'yaw': int(round(self.yaw)),
+                    'vgx': int(world[0] / 10), 'vgy': int(world[1] / 10), 'vgz': int(-self.velocity[2] / 10),
+                    'templ': 60, 'temph': 63, 'tof': int(self.position[2]), 'h': int(self.position[2]),
+                    'bat': int(self.battery), 'baro': self.position[2] / 100, 'time': int(self.flight_time),
+                    'agx': 0.0, 'agy': 0.0, 'agz': -1000.0, 'mid': -1, 'x': 0, 'y': 0, 'z': 0}
+
+    def get_state_field(self, key):
+        return self.get_current_state()[key]
+
+    def get_battery(self):
+        return self.get_state_field('bat')
+
+    def get_height(self):
+        return self.get_state_field('h')
+
+    def get_distance_tof(self):
+        return self.get_state_field('tof')
+
+    def get_yaw(self):
+        return self.get_state_field('yaw')
+
+    def get_flight_time(self):
+        return self.get_state_field('time')
+
+    def get_speed_x(self):
+        return self.get_state_field('vgx')
+
+    def get_speed_y(self):
+        return self.get_state_field('vgy')
+
+    def get_speed_z(self):
+        return self.get_state_field('vgz')
+
+    def get_mission_pad_id(self):
+        return -1
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(min(ax + aw, bx + bw) - max(ax, bx), 0)
+    h = max(min(ay + ah, by + bh) - max(ay, by), 0)
+    union = aw * ah + bw * bh - w * h
+    return w * h / union if union > 0 else 0.0
+
+
+def benchmark(tracker='csrt', seconds=60.0, fps=30, width=640, height=480, seed=0, follower=None, gate=False,
+              target_path=default_target_path):
+    # Closed loop: simulated frame -> tracker -> follower -> RC -> simulated drone; runs unthrottled
+    sim = SimTello(width, height, fps, seed=seed, target_path=target_path)
+    follower = follower or TargetFollower()
+    # Gate on simulated time, the loop runs faster than the wall clock
+    gate = MotionGate(clock=lambda: sim.time) if gate else None
+    sim.connect()
+    sim.streamon()
+    sim.takeoff()
+    reader = sim.get_frame_read()
+
+    frame = reader.frame
+    truth = sim.target_box()
+    if truth is None:
+        raise RuntimeError("Target is not in view at the start")
+    model = create_tracker(tracker)
+    model.init(frame, truth)
+    success, box = True, truth
+
+    frames = lost = unseen = 0
+    errors, overlaps = [], []
+    start = time.perf_counter()
+    for _ in range(int(seconds * fps)):
+        frame = reader.frame
+        truth = sim.target_box()
+        ran = gate is None or gate.should_process(frame, box)
+        if ran:
+            success, box = model.update(frame)
+        frames += 1
+        if truth is None:
+            unseen += 1
+        else:
+            # Centering error of where the target really is
+            errors.append(abs(truth[0] + truth[2] / 2 - width / 2))
+            overlaps.append(iou(box, truth) if success else 0.0)
+        if success:
+            # The tracker's ego motion belongs to the frame it last ran on
+            ego_motion = getattr(model, 'ego_motion', None) if ran else None
+            yaw, fb = follower.step([int(v) for v in box], width, height, ego_motion)
+            sim.send_rc_control(0, fb, 0, yaw)
+            if gate is not None:
+                gate.note_command(0, fb, 0, yaw)
+        else:
+            lost += 1
+            sim.send_rc_control(0, 0, 0, 0)
+    wall = time.perf_counter() - start
+
+    return {'tracker': tracker, 'sim_seconds': sim.time, 'wall_seconds': wall, 'speedup': sim.time / wall,
+            'fps': frames / wall, 'lost_ratio': lost / frames, 'unseen_ratio': unseen / frames,
+            'mean_error_px': float(np.mean(errors)) if errors else float('nan'),
+            'mean_iou': float(np.mean(overlaps)) if overlaps else 0.0,
+            'skip_ratio': gate.skip_ratio if gate is not None else 0.0}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark tracker/controller combinations in the simulator")
+    parser.add_argument('--tracker', nargs='+', choices=sorted(TRACKERS), default=sorted(TRACKERS))
+    parser.add_argument('--seconds', type=float, default=120.0, help="Simulated seconds per run")
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--runs', type=int, default=1, help="Runs per tracker, each with a different scene seed")
+    parser.add_argument('--scene', choices=sorted(SCENES), default='wander', help="How the target moves")
+    parser.add_argument('--gate', action='store_true', help="Skip tracker updates on frames where nothing moved")
+    args = parser.parse_args()
+
+    print(f"{'tracker':8} {'seed':>4} {'sim s':>7} {'wall s':>7} {'x RT':>6} {'fps':>6} {'lost':>6} {'unseen':>7} {'err px':>7} {'IoU':>5} {'skip':>5}")
+    for name in args.tracker:
+        for seed in range(args.runs):
+            r = benchmark(name, args.seconds, args.fps, seed=seed, gate=args.gate,
+                          target_path=SCENES[args.scene])
+            print(f"{name:8} {seed:4d} {r['sim_seconds']:7.1f} {r['wall_seconds']:7.1f} {r['speedup']:6.1f} "
+                  f"{r['fps']:6.0f} {r['lost_ratio']:6.1%} {r['unseen_ratio']:7.1%} {r['mean_error_px']:7.1f} {r['mean_iou']:5.2f} {r['skip_ratio']:5.0%}")
@@ -0,0 +1,110 @@
+from collections import deque
+import cv2
+import numpy as np
+from frame_context import FrameContext
+from trackers import LK_PARAMS
+
+
+def decompose(transform, center):
+    # 2x3 similarity -> (dx, dy, angle in radians), as a rotation about the image centre plus a shift,
+    # which is how the correction is applied
+    rotation = transform[:, :2] / np.hypot(transform[0, 0], transform[1, 0])
+    shift = transform[:, 2] + rotation @ center - center
+    return np.array([shift[0], shift[1], np.arctan2(transform[1, 0], transform[0, 0])])
+
+
+class OnlineStabilizer:
+    # Smooths the camera path over a centred window of 2 * radius + 1 frames, so output lags the input by
+    # radius frames. Inter-frame motion comes from the flow tracker when it ran on this frame and the one before, otherwise from
+    # a small LK pass of our own on the half-size gray view. Only the frames handed back are warped
+    def __init__(self, radius=8, crop=0.06, max_points=150, min_points=20):
+        self.radius = radius
+        self.crop = crop
+        self.max_points = max_points
+        self.min_points = min_points
+
+        self.prev_gray = None
+        self.points = None
+        self.position = np.zeros(3)
+        # (frame, payload, camera position) waiting for their look-ahead
+        self.pending = deque()
+        # Camera positions of the window: radius behind the output frame, radius ahead
+        self.path = deque(maxlen=2 * radius + 1)
+        self.estimated = 0
+        self.reused = 0
+
+    def reset(self):
+        self.prev_gray = None
+        self.points = None
+        self.position = np.zeros(3)
+        self.pending.clear()
+        self.path.clear()
+
+    def estimate(self, gray):
+        # prev -> current similarity at half resolution, translation scaled back up
+        if self.points is None or len(self.points) < self.min_points:
+            self.points = cv2.goodFeaturesToTrack(self.prev_gray, self.max_points, 0.01, 8, blockSize=7)
+        if self.points is None:
+            return None
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, self.points, None, **LK_PARAMS)
+        status = status.ravel().astype(bool)
+        prev, nxt = self.points[status], moved[status]
+        self.points = nxt.reshape(-1, 1, 2) if len(nxt) else None
+        if len(prev) < self.min_points:
+            self.points = None
+            return None
+        transform, _ = cv2.estimateAffinePartial2D(prev, nxt, method=cv2.RANSAC, ransacReprojThreshold=2.0)
+        if transform is None:
+            return None
+        transform[:, 2] *= 2
+        return transform
+
+    def push(self, frame, payload=None, view=None, transform=None):
+        # frame: the display/record frame; view: frame or FrameContext to measure motion on (defaults to frame);
+        # transform: camera motion from the previously pushed frame to this one, if already known (FlowTracker.ego_transform
+        # when the tracker also ran on that frame; anything spanning more frames would be counted twice).
+        # Returns the list of (stabilized frame, payload) that are now ready, oldest first
+        gray = FrameContext.wrap(view if view is not None else frame).gray_half
+        if self.prev_gray is not None:
+            if transform is not None:
+                self.reused += 1
+                # Our points are no longer in step with the frames
+                self.points = None
+            else:
+                transform = self.estimate(gray)
+                self.estimated += 1
+            if transform is not None:
+                h, w = frame.shape[:2]
+                self.position = self.position + decompose(transform, np.array([w / 2, h / 2]))
+        self.prev_gray = gray.copy()
+
+        self.pending.append((frame, payload, self.position.copy()))
+        self.path.append(self.position.copy())
+        if len(self.pending) <= self.radius:
+            return []
+        return [self.output()]
+
+    def flush(self):
+        # At the end of a stream: the remaining frames, each with whatever window is left
+        ready = []
+        while self.pending:
+            ready.append(self.output())
+            if self.path:
+                self.path.popleft()
+        return ready
+
+    def output(self):
+        frame, payload, position = self.pending.popleft()
+        smooth = np.mean(self.path, axis=0)
+        return self.warp(frame, smooth - position), payload
+
+    def warp(self, frame, correction):
+        h, w = frame.shape[:2]
+        # Don't chase more motion than the crop margin can hide
+        dx = float(np.clip(correction[0], -self.crop * w, self.crop * w))
+        dy = float(np.clip(correction[1], -self.crop * h, self.crop * h))
+        angle = np.degrees(correction[2])
+        # Rotation and zoom about the centre, then the shift; one warp per output frame
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), -angle, 1.0 / (1.0 - 2 * self.crop))
+        matrix[:, 2] += matrix[:, :2] @ np.array([dx, dy])
+        return cv2.warpAffine(frame, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
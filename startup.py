@@ -0,0 +1,118 @@
+import time
+import threading
+from collections import deque
+import av
+import numpy as np
+from djitellopy.tello import Tello, BackgroundFrameRead, TelloException
+
+WIDTH, HEIGHT = 640, 480
+
+# Tello sends a bare H.264 elementary stream, so there is nothing worth probing for
+FAST_STREAM_OPTIONS = {
+    'probesize': '32',
+    'analyzeduration': '0',
+    'fflags': 'nobuffer',
+    'flags': 'low_delay',
+}
+
+
+class StartupTimeline:
+    def __init__(self, t0=None, name='startup'):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.name = name
+        self.events = []
+        self.lock = threading.Lock()
+
+    def mark(self, label):
+        elapsed = time.perf_counter() - self.t0
+        with self.lock:
+            self.events.append((label, elapsed))
+        print(f"[{self.name}] {elapsed * 1000:8.1f} ms  {label}")
+        return elapsed
+
+    def summary(self):
+        with self.lock:
+            return list(self.events)
+
+
+class FastFrameRead(BackgroundFrameRead):
+    # Same worker as djitellopy's reader, only the container is opened with low-latency options
+    def __init__(self, tello, address, options=FAST_STREAM_OPTIONS, timeout=Tello.FRAME_GRAB_TIMEOUT, configure=None):
+        self.address = address
+        self.lock = threading.Lock()
+        self.frame = np.zeros([300, 400, 3], dtype=np.uint8)
+        self.frames = deque([], 32)
+        self.with_queue = False
+
+        try:
+            Tello.LOGGER.debug('opening video stream with fast probing...')
+            self.container = av.open(self.address, options=options, timeout=(timeout, None))
+        except av.error.ExitError:
+            raise TelloException('Failed to grab video frames from video stream')
+        if configure is not None:
+            # Decoder settings (e.g. thread count) only take effect before the first packet
+            configure(self.container)
+
+        self.stopped = False
+        self.worker = threading.Thread(target=self.update_frame, args=(), daemon=True)
+
+
+def open_fast_stream(tello, options=FAST_STREAM_OPTIONS, configure=None):
+    reader = FastFrameRead(tello, tello.get_udp_video_address(), options, configure=configure)
+    tello.background_frame_read = reader
+    reader.start()
+    return reader
+
+
+def prewarm_tracker(create_tracker, width=WIDTH, height=HEIGHT):
+    # The first init/update pays for OpenCV's lazy allocations and thread pool start-up
+    frame = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+    tracker = create_tracker()
+    tracker.init(frame, (width // 4, height // 4, width // 4, height // 4))
+    tracker.update(frame)
+
+
+def fast_start(tello, timeline=None, create_tracker=None, open_timeout=Tello.FRAME_GRAB_TIMEOUT + Tello.RESPONSE_TIMEOUT,
+               open_stream=open_fast_stream):
+    timeline = timeline or StartupTimeline()
+    errors = []
+
+    def open_decoder():
+        # The UDP socket can listen before streamon, so probing overlaps with connect
+        deadline = time.monotonic() + open_timeout
+        delay = 0.1
+        while True:
+            try:
+                open_stream(tello)
+                timeline.mark('decoder opened')
+                return
+            except Exception as e:
+                # Any av error too (a probe that was too short, say); the caller re-raises the last one
+                if time.monotonic() > deadline:
+                    errors.append(e)
+                    return
+                Tello.LOGGER.warning(f"Opening the video stream failed, retrying in {delay:.1f} s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+
+    def warm():
+        try:
+            prewarm_tracker(create_tracker)
+            timeline.mark('tracker warmed')
+        except Exception as e:
+            print(f"Tracker pre-warm failed: {e}")
+
+    decoder_thread = threading.Thread(target=open_decoder, daemon=True)
+    decoder_thread.start()
+    if create_tracker is not None:
+        threading.Thread(target=warm, daemon=True).start()
+
+    tello.connect()
+    timeline.mark('connected')
+    tello.streamon()
+    timeline.mark('stream on')
+
+    decoder_thread.join()
+    if errors:
+        raise errors[0]
+    return timeline
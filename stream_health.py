@@ -0,0 +1,164 @@
+import time
+import threading
+
+# Every SAMPLE_STEP-th pixel in each direction, at full resolution: averaging would smooth away the
+# sensor noise that tells a live static view from a decoder repeating itself
+SAMPLE_STEP = 8
+# Telemetry above the hover noise: speed in dm/s summed over the axes, heading change in degrees
+MOVING_SPEED = 1
+MOVING_YAW = 3
+# A new BackgroundFrameRead/FastFrameRead exposes a black frame of this shape until the decoder delivers
+PLACEHOLDER_SHAPE = (300, 400, 3)
+
+
+def is_placeholder(frame):
+    return frame.shape == PLACEHOLDER_SHAPE and not frame.any()
+
+
+def frame_sample(frame, step=SAMPLE_STEP):
+    # Cheap fingerprint: a sparse grid of raw pixels, compared byte for byte
+    return frame[::step, ::step].tobytes()
+
+
+def drone_moving(tello):
+    # From the telemetry, which arrives on its own socket and keeps going when the video freezes.
+    # Returns (moving, yaw); unknown counts as not moving
+    try:
+        state = tello.get_current_state()
+        speed = abs(state['vgx']) + abs(state['vgy']) + abs(state['vgz'])
+        return speed > MOVING_SPEED, state['yaw']
+    except (AttributeError, KeyError, TypeError):
+        return False, None
+
+
+class StreamHealthMonitor:
+    def __init__(self, tello, stall_timeout=1.0, frozen_limit=30, retry_delay=1.0, on_change=None, open_stream=None,
+                 reconnect_grace=5.0):
+        self.tello = tello
+        self.stall_timeout = stall_timeout
+        # A rebuilt stream needs time for streamon and the first keyframe before a new stall counts
+        self.reconnect_grace = reconnect_grace
+        self.frozen_limit = frozen_limit
+        self.retry_delay = retry_delay
+        self.on_change = on_change
+        self.open_stream = open_stream
+
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.last_arrival = None
+        self.frozen_count = 0
+        self.reconnects = 0
+        self.stale = False
+        self.reconnecting = False
+
+        self._last_raw = None
+        self._last_hash = None
+        self._frozen_yaw = None
+        self._last_good = None
+        self._awaiting_frame = False
+        self._reconnect_thread = None
+
+    def read(self):
+        # Returns the newest decoded frame, or the last good one while the stream is being rebuilt;
+        # None until the reader has decoded anything
+        if self.reconnecting:
+            self.check()
+            return self._last_good
+
+        frame = self.tello.get_frame_read().frame
+        if frame is not None and is_placeholder(frame):
+            frame = None
+        self.observe(frame)
+        return frame
+
+    def observe(self, frame):
+        now = time.monotonic()
+        if frame is None or frame is self._last_raw:
+            # BackgroundFrameRead assigns a fresh array for every decoded frame,
+            # so the same object means nothing new has been decoded
+            self.check(now)
+            return
+
+        self._last_raw = frame
+        h = frame_sample(frame)
+        repeated = h == self._last_hash
+        if repeated:
+            # Identical pixels alone happen on a live stream too: a static view can be all skip blocks.
+            # It only counts as frozen while the drone says it is moving and the picture does not
+            moving, yaw = drone_moving(self.tello)
+            if self._frozen_yaw is None:
+                # Heading when the picture stopped changing
+                self._frozen_yaw = yaw
+            turned = yaw is not None and abs((yaw - self._frozen_yaw + 180) % 360 - 180) > MOVING_YAW
+            repeated = moving or turned
+        else:
+            self._frozen_yaw = None
+        with self.lock:
+            self.seq += 1
+            self.last_arrival = now
+            if repeated:
+                self.frozen_count += 1
+            else:
+                self.frozen_count = 0
+                if h != self._last_hash:
+                    self._last_good = frame
+                self._awaiting_frame = False
+            self._last_hash = h
+        self.check(now)
+
+    def check(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            # Nothing to compare against until the first frame has arrived
+            timeout = self.reconnect_grace if self._awaiting_frame else self.stall_timeout
+            stalled = self.last_arrival is not None and now - self.last_arrival > timeout
+            frozen = self.frozen_count >= self.frozen_limit
+            awaiting = self._awaiting_frame
+        self._set_stale(stalled or frozen or awaiting or self.reconnecting)
+
+        if (stalled or frozen) and not self.reconnecting:
+            self.reconnect()
+        return self.stale
+
+    def _set_stale(self, stale):
+        if stale == self.stale:
+            return
+        self.stale = stale
+        if self.on_change is not None:
+            self.on_change(stale)
+
+    def reconnect(self):
+        if self.reconnecting:
+            return
+        self.reconnecting = True
+        self._set_stale(True)
+        self._reconnect_thread = threading.Thread(target=self._reconnect_worker, daemon=True)
+        self._reconnect_thread.start()
+
+    def _reconnect_worker(self):
+        while True:
+            try:
+                # streamoff() stops the old BackgroundFrameRead, get_frame_read() opens a new container
+                self.tello.streamoff()
+                self.tello.streamon()
+                if self.open_stream is not None:
+                    self.open_stream(self.tello)
+                else:
+                    self.tello.get_frame_read()
+                break
+            except Exception as e:
+                self.tello.LOGGER.warning(f"Video stream reconnect failed: {e}")
+                self.tello.background_frame_read = None
+                time.sleep(self.retry_delay)
+
+        with self.lock:
+            self.reconnects += 1
+            self.frozen_count = 0
+            self._last_hash = None
+            self._frozen_yaw = None
+            self._last_raw = None
+            self.last_arrival = time.monotonic()
+            # Stay stale until the new stream delivers a fresh frame
+            self._awaiting_frame = True
+        self.reconnecting = False
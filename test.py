@@ -4,15 +4,12 @@ import numpy as np
 import argparse
 import keyboard
 from djitellopy import Tello
+from frame_source import DroneFrameSource
+from roi_select import StreamSelector
 
 WIDTH, HEIGHT = 640, 480
 FPS = 30
 
-def get_frame(tello, width=WIDTH, height=HEIGHT):
-    frame = tello.get_frame_read().frame
-    resized_frame = cv2.resize(frame, (width, height))
-    return resized_frame
-
 class RyzeTello:
     def __init__(self, save_path):
         self.tello = Tello()
@@ -32,6 +29,9 @@ class RyzeTello:
         self.pid = [0.4, 0.4, 0]
         self.pError = 0
 
+        self.source = DroneFrameSource(self.tello, WIDTH, HEIGHT)
+        self.selector = StreamSelector()
+
     def draw_crosshair(self, frame):
         h, w, _ = frame.shape
         center_x, center_y = w // 2, h // 2
@@ -43,13 +43,34 @@ class RyzeTello:
     def run(self):
         self.tello.connect()
         self.tello.streamon()
+        self.source.start()
 
+        cv2.namedWindow('Tello Drone')
+        self.selector.attach('Tello Drone')
+
+        seq = 0
         while True:
-            frame = get_frame(self.tello, WIDTH, HEIGHT)
+            item = self.source.next_frame(seq, timeout=0.1)
+            if item is None:
+                # No new frame yet: keep the window and the keyboard sticks responsive, even with the video down
+                if self.handle_keys(None):
+                    break
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
+            seq = item.seq
+            frame = item.image.copy()
 
             if self.handle_keys(frame):
                 break
 
+            self.selector.set_frame(item.image)
+            box = self.selector.poll()
+            if box is not None:
+                self.BB = box
+                self.tracker = cv2.TrackerCSRT_create()
+                self.tracker.init(frame, self.BB)
+
             if self.BB is not None:
                 success, frame, box = self.track(frame)
                 if success:
@@ -58,6 +79,7 @@ class RyzeTello:
             self.draw_crosshair(frame)
 
             cv2.putText(frame, f'Battery: {self.tello.get_battery()}%', (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            self.selector.draw(frame)
             cv2.imshow('Tello Drone', frame)
 
             # Write the frame to the video file
@@ -66,6 +88,7 @@ class RyzeTello:
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
+        self.source.stop()
         cv2.destroyAllWindows()
         self.tello.end()
         self.out.release()
@@ -80,8 +103,7 @@ class RyzeTello:
             self.tello.land()
             self.send_rc_control = False
         elif keyboard.is_pressed('c'):
-            self.BB = cv2.selectROI("Tello Drone", frame, fromCenter=False, showCrosshair=True)
-            self.tracker.init(frame, self.BB)
+            self.selector.arm()
 
         if self.send_rc_control:
             # fly forward and back
@@ -1,6 +1,8 @@
 import tkinter as tk
 import cv2
 from PIL import Image, ImageTk
+from frame_source import WebcamFrameSource
+from clip_buffer import PreTriggerBuffer
 
 class WebcamApp:
     def __init__(self, window, window_title, video_source=0):
@@ -8,9 +10,11 @@ class WebcamApp:
         self.window.title(window_title)
         
         self.video_source = video_source
-        self.vid = cv2.VideoCapture(self.video_source)
+        self.vid = WebcamFrameSource(self.video_source, width=None, height=None).start()
+        self.last_seq = 0
+        self.ring = PreTriggerBuffer()
         
-        self.canvas = tk.Canvas(window, width=self.vid.get(cv2.CAP_PROP_FRAME_WIDTH), height=self.vid.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.canvas = tk.Canvas(window, width=self.vid.width, height=self.vid.height)
         self.canvas.pack()
 
         self.btn_snapshot = tk.Button(window, text="Сделать снимок", width=50, command=self.snapshot)
@@ -22,13 +26,15 @@ class WebcamApp:
         self.window.mainloop()
 
     def snapshot(self):
-        ret, frame = self.vid.read()
-        if ret:
-            cv2.imwrite("snapshot.png", cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        # Кадр уже закодований у буфері, запис відбувається у фоновому потоці
+        self.ring.save_still("snapshot.jpg")
 
     def update(self):
-        ret, frame = self.vid.read()
-        if ret:
+        item = self.vid.latest_frame()
+        if item is not None and item.seq != self.last_seq:
+            self.last_seq = item.seq
+            frame = item.image
+            self.ring.push(frame, item.timestamp)
             self.photo = ImageTk.PhotoImage(image=Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
             self.canvas.create_image(0, 0, image=self.photo, anchor=tk.NW)
         self.window.after(self.delay, self.update)
@@ -6,6 +6,7 @@ from djitellopy import Tello
 import tkinter as tk
 from tkinter import scrolledtext
 from PIL import Image, ImageTk
+from text_log import append_log
 
 WIDTH, HEIGHT = 640, 480
 FPS = 30
@@ -59,8 +60,7 @@ class RyzeTello:
         self.root.bind('<KeyRelease>', self.on_key_release)
 
     def log_message(self, message):
-        self.text_area.insert(tk.END, message + '\n')
-        self.text_area.see(tk.END)
+        append_log(self.text_area, message)
 
     def takeoff(self):
         self.tello.takeoff()
@@ -98,14 +98,13 @@ class RyzeTello:
         cv2.putText(frame, f'Battery: {self.tello.get_battery()}%', (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
 
         # Convert the frame to a format suitable for Tkinter
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(frame)
+        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
         imgtk = ImageTk.PhotoImage(image=img)
         self.video_label.imgtk = imgtk
         self.video_label.configure(image=imgtk)
 
-        # Write the frame to the video file
-        self.out.write(cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR))
+        # Write the frame to the video file, it is still BGR
+        self.out.write(frame)
 
         self.video_label.after(10, self.update_video_feed)
 
@@ -5,6 +5,7 @@ import argparse
 from djitellopy import Tello
 import customtkinter as ctk
 from PIL import Image, ImageTk
+from text_log import append_log
 
 WIDTH, HEIGHT = 640, 480
 FPS = 30
@@ -61,8 +62,7 @@ class RyzeTello:
         self.update_video_feed()
 
     def log_message(self, message):
-        self.text_area.insert(ctk.END, message + '\n')
-        self.text_area.see(ctk.END)
+        append_log(self.text_area, message)
 
     def takeoff(self):
         self.tello.takeoff()
@@ -113,14 +113,13 @@ class RyzeTello:
             self.log_message(f"Failed to get battery status: {e}")
 
         # Convert the frame to a format suitable for Tkinter
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(frame)
+        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
         imgtk = ImageTk.PhotoImage(image=img)
         self.video_label.imgtk = imgtk
         self.video_label.configure(image=imgtk)
 
-        # Write the frame to the video file
-        self.out.write(cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR))
+        # Write the frame to the video file, it is still BGR
+        self.out.write(frame)
 
         self.video_label.after(10, self.update_video_feed)
 
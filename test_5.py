@@ -2,22 +2,17 @@ import cv2
 import numpy as np
 import customtkinter as ctk
 from PIL import Image, ImageTk
+from text_log import append_log
 import threading
-import time
+from frame_source import WebcamFrameSource
+from roi_select import StreamSelector
 
 WIDTH, HEIGHT = 640, 480
 FPS = 30
 
-def get_frame(cap, width=WIDTH, height=HEIGHT):
-    ret, frame = cap.read()
-    if not ret:
-        return None
-    resized_frame = cv2.resize(frame, (width, height))
-    return resized_frame
-
 class WebcamApp:
     def __init__(self):
-        self.cap = cv2.VideoCapture(0)
+        self.cap = WebcamFrameSource(0, WIDTH, HEIGHT).start()
         self.tracker = cv2.TrackerCSRT_create()
         self.BB = None
         self.pid = [0.4, 0.4, 0]
@@ -35,6 +30,12 @@ class WebcamApp:
         self.video_label = ctk.CTkLabel(self.root)
         self.video_label.pack()
 
+        # Click or drag on the video to pick the target, the feed keeps running
+        self.selector = StreamSelector()
+        self.video_label.bind('<ButtonPress-1>', lambda e: self.selector.press(e.x, e.y))
+        self.video_label.bind('<B1-Motion>', lambda e: self.selector.move(e.x, e.y))
+        self.video_label.bind('<ButtonRelease-1>', lambda e: self.selector.release(e.x, e.y))
+
         self.controls_frame = ctk.CTkFrame(self.root)
         self.controls_frame.pack()
 
@@ -54,8 +55,7 @@ class WebcamApp:
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
     def log_message(self, message):
-        self.text_area.insert(ctk.END, message + '\n')
-        self.text_area.see(ctk.END)
+        append_log(self.text_area, message)
 
     def draw_crosshair(self, frame):
         h, w, _ = frame.shape
@@ -69,10 +69,23 @@ class WebcamApp:
         self.root.mainloop()
 
     def update_video_feed(self):
+        seq = 0
         while self.running:
-            frame = get_frame(self.cap, WIDTH, HEIGHT)
-            if frame is None:
+            # Blocks until the capture thread has something new, so no sleep-based pacing
+            item = self.cap.next_frame(seq, timeout=0.5)
+            if item is None:
                 continue
+            seq = item.seq
+            frame = item.image.copy()
+
+            self.selector.set_frame(item.image)
+            box = self.selector.poll()
+            if box is not None:
+                self.BB = box
+                self.tracker = cv2.TrackerCSRT_create()
+                self.tracker.init(frame, self.BB)
+                self.tracking = True
+                self.log_message("Tracking started")
 
             if self.tracking and self.BB is not None:
                 success, frame, box = self.track(frame)
@@ -80,6 +93,7 @@ class WebcamApp:
                     self.track_target(box, WIDTH, HEIGHT)
 
             self.draw_crosshair(frame)
+            self.selector.draw(frame)
 
             # Convert the frame to a format suitable for Tkinter
             frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -88,28 +102,12 @@ class WebcamApp:
             self.video_label.imgtk = imgtk
             self.video_label.configure(image=imgtk)
 
-            time.sleep(1 / FPS)  # Control frame rate
-
     def start_tracking(self):
-        # Create a separate thread to select the ROI
-        roi_thread = threading.Thread(target=self.select_roi)
-        roi_thread.start()
-
-    def select_roi(self):
-        # Pause the video update while selecting ROI
-        self.running = False
-        frame = get_frame(self.cap, WIDTH, HEIGHT)
-        if frame is not None:
-            self.BB = cv2.selectROI("Select ROI", frame, fromCenter=False, showCrosshair=True)
-            cv2.destroyWindow("Select ROI")
-            if self.BB and self.BB != (0, 0, 0, 0):
-                self.tracker = cv2.TrackerCSRT_create()
-                self.tracker.init(frame, self.BB)
-                self.tracking = True
-                self.log_message("Tracking started")
-        self.running = True
+        self.selector.arm()
+        self.log_message("Click or drag on the video to select the target")
 
     def stop_tracking(self):
+        self.selector.cancel()
         self.tracking = False
         self.BB = None
         self.log_message("Tracking stopped")
@@ -137,7 +135,7 @@ class WebcamApp:
     def on_closing(self):
         self.running = False
         self.video_thread.join()
-        self.cap.release()
+        self.cap.stop()
         self.root.destroy()
 
 if __name__ == '__main__':
@@ -0,0 +1,135 @@
+import unittest
+
+from mission import MissionError, MissionExecutor, compile_plan
+
+
+def plan(*commands, **options):
+    return dict(options, commands=list(commands))
+
+
+class CompilePlanTest(unittest.TestCase):
+    def test_compiles_sdk_commands(self):
+        steps = compile_plan(plan({'cmd': 'takeoff'}, {'cmd': 'go', 'x': 100, 'y': 0, 'z': 50},
+                                  {'cmd': 'rotate', 'angle': -90}, {'cmd': 'wait', 'seconds': 2},
+                                  {'cmd': 'land'}, speed=50))
+        self.assertEqual([(name, command) for name, command, _ in steps],
+                         [('takeoff', 'takeoff'), ('go', 'go 100 0 50 50'), ('rotate', 'ccw 90'),
+                          ('wait', None), ('land', 'land')])
+        self.assertEqual(steps[3][2], 2.0)
+
+    def test_extra_fields_are_ignored(self):
+        steps = compile_plan(plan({'cmd': 'up', 'distance': 40, 'note': 'leg1'}))
+        self.assertEqual(steps[0][1], 'up 40')
+
+    def test_long_slow_leg_gets_a_long_timeout(self):
+        (_, _, fast), = compile_plan(plan({'cmd': 'go', 'x': 500, 'y': 0, 'z': 0, 'speed': 100}))
+        (_, _, slow), = compile_plan(plan({'cmd': 'go', 'x': 500, 'y': 0, 'z': 0, 'speed': 10}))
+        self.assertGreater(slow, 50)
+        self.assertLess(fast, slow)
+
+    def assertInvalid(self, data, message):
+        with self.assertRaises(MissionError) as caught:
+            compile_plan(data)
+        self.assertIn(message, str(caught.exception))
+
+    def test_rejects_bad_steps_without_crashing(self):
+        self.assertInvalid(plan({'cmd': 'go', 'x': 'a', 'y': 0, 'z': 0, 'speed': 20}), "got 'a'")
+        self.assertInvalid(plan('takeoff'), "step 0: expected a mapping")
+        self.assertInvalid(plan({'cmd': 'rotate', 'angle': None}), "angle must be between")
+        self.assertInvalid(plan({'cmd': 'flip'}), "unknown command 'flip'")
+        self.assertInvalid(plan({'cmd': 'go', 'x': 10}), "missing y, z, speed")
+        self.assertInvalid(plan({'cmd': 'go', 'x': 10, 'y': 5, 'z': 0, 'speed': 20}), "cannot all be within")
+        self.assertInvalid(plan({'cmd': 'rotate', 'angle': 0}), "angle cannot be 0")
+        self.assertInvalid(plan({'cmd': 'go', 'x': True, 'y': 0, 'z': 0, 'speed': 20}), "x/y/z must be between")
+
+    def test_reports_every_bad_step(self):
+        with self.assertRaises(MissionError) as caught:
+            compile_plan(plan({'cmd': 'up'}, 'land', {'cmd': 'wait', 'seconds': -1}))
+        self.assertEqual(str(caught.exception).count('step '), 3)
+
+    def test_rejects_empty_and_malformed_plans(self):
+        self.assertInvalid(plan(), "no commands")
+        self.assertInvalid({'commands': 'takeoff'}, "must be a list")
+        self.assertInvalid(42, "must be a list")
+
+
+class FakeTello:
+    TAKEOFF_TIMEOUT = 20
+    RESPONSE_TIMEOUT = 1
+
+    def __init__(self, replies=()):
+        self.replies = list(replies)
+        self.sent = []
+        self.on_send = None
+        # djitellopy's per-drone reply queue; only replies nobody waited for end up here
+        self.responses = []
+
+    def get_own_udp_object(self):
+        return {'responses': self.responses}
+
+    def send_command_with_return(self, command, timeout):
+        self.sent.append((command, timeout))
+        if self.on_send is not None:
+            self.on_send(command)
+        return self.replies.pop(0) if self.replies else 'ok'
+
+    def send_command_without_return(self, command):
+        self.sent.append((command, None))
+        self.responses.append(b'ok')
+
+    def get_battery(self):
+        return 100
+
+
+def run(executor):
+    executor.start()
+    executor.thread.join(timeout=5)
+
+
+class MissionExecutorTest(unittest.TestCase):
+    def test_error_reply_is_retried(self):
+        tello = FakeTello(['error', 'ok'])
+        executor = MissionExecutor(tello, compile_plan(plan({'cmd': 'up', 'distance': 50})))
+        run(executor)
+        self.assertEqual([command for command, _ in tello.sent], ['up 50', 'up 50'])
+        self.assertIsNone(executor.aborted)
+        self.assertEqual(executor.completed, 1)
+
+    def test_leg_is_not_resent_after_abort(self):
+        tello = FakeTello(['error'])
+        executor = MissionExecutor(tello, compile_plan(plan({'cmd': 'go', 'x': 300, 'y': 0, 'z': 0, 'speed': 20},
+                                                            {'cmd': 'land'})))
+        # The operator aborts while the leg is in flight; the drone answers the interrupted go with an error
+        tello.on_send = lambda command: executor.abort("operator") if command.startswith('go') else None
+        run(executor)
+        self.assertEqual([command for command, _ in tello.sent], ['go 300 0 0 20', 'stop'])
+        self.assertEqual(executor.aborted, "operator")
+        # The stop's reply is taken before the worker exits, so the next command gets its own
+        self.assertEqual(tello.responses, [])
+        self.assertFalse(executor.busy)
+
+    def test_abort_during_wait_stops_the_worker(self):
+        tello = FakeTello()
+        executor = MissionExecutor(tello, compile_plan(plan({'cmd': 'wait', 'seconds': 30}, {'cmd': 'land'})))
+        executor.start()
+        executor.abort("operator landing")
+        self.assertTrue(executor.join(timeout=5))
+        self.assertFalse(executor.running)
+        self.assertEqual([command for command, _ in tello.sent], ['stop'])
+        self.assertEqual(tello.responses, [])
+
+    def test_lost_reply_aborts_without_resending(self):
+        tello = FakeTello(["Aborting command 'up 50'. Did not receive a response after 15 seconds"])
+        executor = MissionExecutor(tello, compile_plan(plan({'cmd': 'up', 'distance': 50}, {'cmd': 'land'})))
+        run(executor)
+        self.assertEqual([command for command, _ in tello.sent], ['up 50', 'stop'])
+        self.assertIn("Did not receive a response", executor.aborted)
+
+    def test_timeout_covers_the_leg(self):
+        tello = FakeTello()
+        run(MissionExecutor(tello, compile_plan(plan({'cmd': 'go', 'x': 500, 'y': 0, 'z': 0, 'speed': 10}))))
+        self.assertGreater(tello.sent[0][1], 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
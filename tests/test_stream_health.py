@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+
+from simulator import SimTello, hover_target_path
+from stream_health import StreamHealthMonitor
+
+
+class FakeReader:
+    def __init__(self):
+        self.frame = None
+
+
+class FakeTello:
+    # Hands out whatever frames and telemetry the test sets; never actually reconnects
+    def __init__(self):
+        self.reader = FakeReader()
+        self.state = {'vgx': 0, 'vgy': 0, 'vgz': 0, 'yaw': 0}
+
+    def get_frame_read(self):
+        return self.reader
+
+    def get_current_state(self):
+        return self.state
+
+    def streamoff(self):
+        pass
+
+    def streamon(self):
+        pass
+
+
+class StreamHealthTest(unittest.TestCase):
+    def setUp(self):
+        self.tello = FakeTello()
+        self.monitor = StreamHealthMonitor(self.tello, stall_timeout=60, frozen_limit=10)
+        self.scene = np.random.default_rng(0).integers(0, 255, (720, 960, 3), dtype=np.uint8)
+
+    def feed(self, frames):
+        for frame in frames:
+            self.tello.reader.frame = frame
+            self.monitor.read()
+
+    def test_static_noisy_scene_is_live(self):
+        noise = np.random.default_rng(1)
+        self.feed(np.clip(self.scene + noise.normal(0, 2, self.scene.shape), 0, 255).astype(np.uint8)
+                  for _ in range(40))
+        self.assertFalse(self.monitor.stale)
+        self.assertEqual(self.monitor.reconnects, 0)
+
+    def test_identical_frames_while_hovering_are_live(self):
+        # A still view coded as all skip blocks decodes to the same pixels every frame
+        self.feed(self.scene.copy() for _ in range(40))
+        self.assertFalse(self.monitor.stale)
+        self.assertEqual(self.monitor.frozen_count, 0)
+
+    def test_identical_frames_while_moving_are_frozen(self):
+        self.feed([self.scene.copy()])
+        self.tello.state = {'vgx': 5, 'vgy': 0, 'vgz': 0, 'yaw': 0}
+        self.feed(self.scene.copy() for _ in range(10))
+        self.assertTrue(self.monitor.stale)
+        self.monitor._reconnect_thread.join(timeout=5)
+        self.assertEqual(self.monitor.reconnects, 1)
+
+    def test_identical_frames_while_turning_are_frozen(self):
+        self.feed([self.scene.copy()])
+        for yaw in range(0, 55, 5):
+            self.tello.state = {'vgx': 0, 'vgy': 0, 'vgz': 0, 'yaw': yaw}
+            self.feed([self.scene.copy()])
+        self.assertTrue(self.monitor.stale)
+
+    def test_hovering_simulator_is_not_frozen(self):
+        sim = SimTello(target_path=hover_target_path)
+        sim.takeoff()
+        monitor = StreamHealthMonitor(sim, stall_timeout=60, frozen_limit=10)
+        for _ in range(60):
+            monitor.read()
+        self.assertFalse(monitor.stale)
+        self.assertEqual(monitor.reconnects, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
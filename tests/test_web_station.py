@@ -0,0 +1,68 @@
+import json
+import unittest
+import http.client
+from unittest import mock
+
+import cv2
+import numpy as np
+
+from web_station import GroundStation
+
+
+class GroundStationTest(unittest.TestCase):
+    def setUp(self):
+        # Loopback client against an ephemeral port
+        self.station = GroundStation(host='127.0.0.1', port=0).start()
+        self.frame = np.random.randint(0, 255, (48, 64, 3), dtype=np.uint8)
+        self.encode = mock.patch('web_station.cv2.imencode', wraps=cv2.imencode).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        self.station.stop()
+
+    def get(self, path):
+        connection = http.client.HTTPConnection('127.0.0.1', self.station.port, timeout=5)
+        self.addCleanup(connection.close)
+        connection.request('GET', path)
+        return connection.getresponse()
+
+    def test_snapshot(self):
+        self.station.publish_frame(self.frame)
+        response = self.get('/snapshot.jpg')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Content-Type'), 'image/jpeg')
+        image = cv2.imdecode(np.frombuffer(response.read(), np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(image.shape, self.frame.shape)
+
+    def test_mjpeg_stream(self):
+        self.station.publish_frame(self.frame)
+        response = self.get('/stream.mjpg?q=low')
+        self.assertEqual(response.status, 200)
+        self.assertIn('multipart/x-mixed-replace', response.getheader('Content-Type'))
+        self.assertEqual(response.fp.readline(), b'--frame\r\n')
+        self.assertEqual(response.fp.readline(), b'Content-Type: image/jpeg\r\n')
+        length = int(response.fp.readline().split(b':')[1])
+        response.fp.readline()
+        self.assertEqual(response.fp.read(length)[:2], b'\xff\xd8')
+
+    def test_telemetry_events(self):
+        self.station.publish_telemetry(battery=87, flying=False)
+        response = self.get('/telemetry')
+        self.assertEqual(response.getheader('Content-Type'), 'text/event-stream')
+        line = response.fp.readline()
+        self.assertTrue(line.startswith(b'data: '))
+        self.assertEqual(json.loads(line[6:]), {'battery': 87, 'flying': False})
+
+    def test_each_frame_encoded_once_per_quality(self):
+        self.station.publish_frame(self.frame)
+        for path in ('/snapshot.jpg', '/snapshot.jpg', '/snapshot.jpg?q=low', '/snapshot.jpg?q=low'):
+            self.assertEqual(self.get(path).status, 200)
+        self.assertEqual(self.encode.call_count, 2)
+
+        self.station.publish_frame(self.frame.copy())
+        self.get('/snapshot.jpg').read()
+        self.assertEqual(self.encode.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,12 @@
+# Log panes for the Tk / customtkinter front ends. Only the newest lines are kept,
+# so a long session doesn't grow the widget without bound
+LOG_LINES = 200
+
+
+def append_log(text_area, message, max_lines=LOG_LINES):
+    # Works on tk.Text / ScrolledText and ctk.CTkTextbox, which share the Text index API
+    text_area.insert('end', message + '\n')
+    lines = int(text_area.index('end-1c').split('.')[0]) - 1
+    if lines > max_lines:
+        text_area.delete('1.0', f'{lines - max_lines + 1}.0')
+    text_area.see('end')
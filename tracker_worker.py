@@ -0,0 +1,186 @@
+import time
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+# Control block (int64): newest slot, slot being read by the child, newest frame seq, child heartbeat (ns)
+LATEST, READING, FRAME_SEQ, HEARTBEAT = range(4)
+# Result block (float64), written with a seqlock: version, generation, frame seq, success, x, y, w, h, elapsed ms
+VERSION, GENERATION, RESULT_SEQ, SUCCESS, BOX, ELAPSED = 0, 1, 2, 3, 4, 8
+CONTROL_SIZE, RESULT_SIZE = 4, 9
+
+
+def attach(shm, shape):
+    frame_bytes = int(np.prod(shape))
+    frames = np.ndarray((2,) + tuple(shape), dtype=np.uint8, buffer=shm.buf)
+    control = np.ndarray((CONTROL_SIZE,), dtype=np.int64, buffer=shm.buf, offset=2 * frame_bytes)
+    result = np.ndarray((RESULT_SIZE,), dtype=np.float64, buffer=shm.buf, offset=2 * frame_bytes + 8 * CONTROL_SIZE)
+    return frames, control, result
+
+
+def worker_main(name, shm_name, shape, commands, new_frame):
+    from trackers import create_tracker
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames, control, result = attach(shm, shape)
+    tracker = None
+    generation = 0
+    last_seq = 0
+    frame = np.empty(shape, dtype=np.uint8)
+
+    try:
+        while True:
+            control[HEARTBEAT] = time.monotonic_ns()
+            try:
+                command = commands.get_nowait()
+            except queue.Empty:
+                command = None
+            if command is not None:
+                if command[0] == 'stop':
+                    break
+                _, generation, init_frame, box = command
+                tracker = create_tracker(name)
+                tracker.init(init_frame, box)
+                last_seq = 0
+                continue
+
+            if not new_frame.wait(0.1) or tracker is None:
+                continue
+            new_frame.clear()
+
+            # Claim the newest slot; the parent never writes a slot the child is reading
+            slot = int(control[LATEST])
+            control[READING] = slot
+            if control[LATEST] != slot:
+                control[READING] = -1
+                new_frame.set()
+                continue
+            seq = int(control[FRAME_SEQ])
+            np.copyto(frame, frames[slot])
+            control[READING] = -1
+            if seq <= last_seq:
+                continue
+            last_seq = seq
+
+            start = time.perf_counter()
+            success, box = tracker.update(frame)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            result[VERSION] += 1
+            result[GENERATION] = generation
+            result[RESULT_SEQ] = seq
+            result[SUCCESS] = float(success)
+            result[BOX:BOX + 4] = box
+            result[ELAPSED] = elapsed
+            result[VERSION] += 1
+    finally:
+        del frames, control, result
+        shm.close()
+
+
+class TrackerWorker:
+    # Runs the tracker in a child process; frames go in through shared-memory double buffers
+    # and the newest result is read back without locks
+    def __init__(self, name='csrt', width=640, height=480, hang_timeout=2.0):
+        self.name = name
+        self.shape = (height, width, 3)
+        self.hang_timeout = hang_timeout
+        self.ctx = mp.get_context('spawn')
+
+        size = 2 * int(np.prod(self.shape)) + 8 * (CONTROL_SIZE + RESULT_SIZE)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.frames, self.control, self.result = attach(self.shm, self.shape)
+        self.control[:] = [0, -1, 0, 0]
+        self.result[:] = 0
+
+        self.seq = 0
+        self.generation = 0
+        self.last_init = None
+        self.restarts = 0
+        self.process = None
+        self.start()
+
+    def start(self):
+        self.commands = self.ctx.Queue()
+        self.new_frame = self.ctx.Event()
+        # Grace period while the child imports OpenCV
+        self.control[HEARTBEAT] = time.monotonic_ns() + 5 * 10 ** 9
+        self.process = self.ctx.Process(target=worker_main, daemon=True,
+                                        args=(self.name, self.shm.name, self.shape, self.commands, self.new_frame))
+        self.process.start()
+
+    def init(self, frame, box):
+        self.generation += 1
+        self.last_init = (frame.copy(), tuple(int(v) for v in box))
+        self.commands.put(('init', self.generation, self.last_init[0], self.last_init[1]))
+        return True
+
+    def submit(self, frame):
+        # Write into the slot that is neither the newest nor being read; drop the frame if both are busy
+        latest = int(self.control[LATEST])
+        slot = 1 - latest
+        if self.control[READING] == slot:
+            return False
+        np.copyto(self.frames[slot], frame)
+        self.seq += 1
+        self.control[FRAME_SEQ] = self.seq
+        self.control[LATEST] = slot
+        self.new_frame.set()
+        return True
+
+    def read_result(self, attempts=1000):
+        for _ in range(attempts):
+            version = self.result[VERSION]
+            values = self.result.copy()
+            if version % 2 == 0 and self.result[VERSION] == version:
+                return values
+        # Writer died mid-update; the watchdog resets the block
+        values[SUCCESS] = 0
+        return values
+
+    def update(self, frame):
+        # Asynchronous: returns the newest finished result, usually for the previous frame.
+        # Success is None while the child has not answered since the last init; that is not a loss
+        self.watchdog()
+        self.submit(frame)
+        values = self.read_result()
+        if values[GENERATION] != self.generation or values[RESULT_SEQ] == 0:
+            return None, self.last_init[1] if self.last_init is not None else (0, 0, 0, 0)
+        return bool(values[SUCCESS]), tuple(values[BOX:BOX + 4])
+
+    def timing(self):
+        values = self.read_result()
+        return int(values[RESULT_SEQ]), float(values[ELAPSED])
+
+    def watchdog(self):
+        age = (time.monotonic_ns() - int(self.control[HEARTBEAT])) / 1e9
+        if self.process.is_alive() and age < self.hang_timeout:
+            return
+        print(f"Tracker worker {'hung' if self.process.is_alive() else 'died'}, restarting")
+        self.process.kill()
+        self.process.join(timeout=1.0)
+        self.control[READING] = -1
+        if self.result[VERSION] % 2:
+            self.result[VERSION] += 1
+        self.restarts += 1
+        self.start()
+        if self.last_init is not None:
+            # Carry on from the last known box rather than the original selection
+            values = self.read_result()
+            box = tuple(values[BOX:BOX + 4]) if values[GENERATION] == self.generation and values[SUCCESS] else self.last_init[1]
+            frame = self.frames[int(self.control[LATEST])].copy()
+            self.init(frame, box)
+
+    def close(self):
+        if self.process is not None and self.process.is_alive():
+            self.commands.put(('stop',))
+            self.process.join(timeout=1.0)
+            if self.process.is_alive():
+                self.process.kill()
+        # Init frames still queued for a dead child must not block interpreter exit
+        self.commands.cancel_join_thread()
+        self.commands.close()
+        del self.frames, self.control, self.result
+        self.shm.close()
+        self.shm.unlink()
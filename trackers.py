@@ -0,0 +1,142 @@
+import cv2
+import numpy as np
+from frame_context import FrameContext
+
+LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+
+class FlowTracker:
+    # Pyramidal Lucas-Kanade tracker: corners inside the box follow the target,
+    # corners outside it give the camera's own motion
+    def __init__(self, max_target_points=60, max_background_points=120, min_points=8):
+        self.max_target_points = max_target_points
+        self.max_background_points = max_background_points
+        self.min_points = min_points
+
+        self.box = None
+        self.prev_gray = None
+        self.gray_pool = None
+        self.target_points = None
+        self.background_points = None
+
+        # Similarity transform of the background between the last two frames (2x3) and its
+        # decomposition; (0, 0, 0) when unknown
+        self.ego_transform = None
+        self.ego_motion = (0.0, 0.0, 0.0)
+        # Matched background points of the last update, reusable by other stages
+        self.background_flow = None
+
+    def gray(self, frame):
+        # Kept as the previous frame, so the view is retained and handed back to its pool later
+        context = FrameContext.wrap(frame)
+        self.gray_pool = context.pool
+        return context.retain('gray')
+
+    def set_prev_gray(self, gray):
+        old, self.prev_gray = self.prev_gray, gray
+        if old is not None and old is not gray and self.gray_pool is not None:
+            self.gray_pool.release(old)
+
+    def detect(self, gray, box, inside, max_points):
+        x, y, w, h = [int(v) for v in box]
+        if inside:
+            # Stay clear of the box edges, corners there usually belong to the background
+            mx, my = w // 8, h // 8
+            mask = np.zeros_like(gray)
+            mask[max(y + my, 0):y + h - my, max(x + mx, 0):x + w - mx] = 255
+        else:
+            mask = np.full_like(gray, 255)
+            mask[max(y, 0):y + h, max(x, 0):x + w] = 0
+        points = cv2.goodFeaturesToTrack(gray, max_points, 0.01, 7, mask=mask, blockSize=7)
+        if points is None:
+            return np.empty((0, 1, 2), dtype=np.float32)
+        return points
+
+    def init(self, frame, box):
+        gray = self.gray(frame)
+        self.box = tuple(float(v) for v in box)
+        self.target_points = self.detect(gray, self.box, True, self.max_target_points)
+        self.background_points = self.detect(gray, self.box, False, self.max_background_points)
+        self.set_prev_gray(gray)
+        self.ego_transform = None
+        self.ego_motion = (0.0, 0.0, 0.0)
+        self.background_flow = None
+        return len(self.target_points) >= self.min_points
+
+    def update(self, frame):
+        if self.box is None:
+            return False, (0, 0, 0, 0)
+
+        gray = self.gray(frame)
+
+        n_target = len(self.target_points)
+        points = np.concatenate([self.target_points, self.background_points]).astype(np.float32)
+        if len(points) == 0:
+            self.set_prev_gray(gray)
+            return False, self.box
+
+        # One LK pass over both point sets, so the image pyramids are built once per frame pair
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None, **LK_PARAMS)
+        status = status.ravel().astype(bool)
+        self.set_prev_gray(gray)
+
+        t_prev, t_next = points[:n_target][status[:n_target]], moved[:n_target][status[:n_target]]
+        b_prev, b_next = points[n_target:][status[n_target:]], moved[n_target:][status[n_target:]]
+
+        self.update_ego_motion(b_prev, b_next)
+
+        success = False
+        if len(t_next) >= self.min_points:
+            transform, inliers = cv2.estimateAffinePartial2D(t_prev, t_next, method=cv2.RANSAC,
+                                                             ransacReprojThreshold=3.0)
+            if transform is not None and inliers.sum() >= self.min_points:
+                self.box = self.apply_transform(transform, frame.shape)
+                t_next = t_next[inliers.ravel().astype(bool)]
+                success = True
+
+        if not success:
+            return False, self.box
+
+        # Top up features that drifted away or were rejected as outliers
+        if len(t_next) < self.max_target_points // 2:
+            t_next = self.detect(gray, self.box, True, self.max_target_points)
+        if len(b_next) < self.max_background_points // 2:
+            b_next = self.detect(gray, self.box, False, self.max_background_points)
+        self.target_points = t_next.reshape(-1, 1, 2)
+        self.background_points = b_next.reshape(-1, 1, 2)
+        return True, self.box
+
+    def update_ego_motion(self, prev, nxt):
+        self.background_flow = (prev, nxt)
+        self.ego_transform = None
+        self.ego_motion = (0.0, 0.0, 0.0)
+        if len(prev) < self.min_points:
+            return
+        transform, _ = cv2.estimateAffinePartial2D(prev, nxt, method=cv2.RANSAC, ransacReprojThreshold=3.0)
+        if transform is None:
+            return
+        self.ego_transform = transform
+        angle = np.degrees(np.arctan2(transform[1, 0], transform[0, 0]))
+        self.ego_motion = (float(transform[0, 2]), float(transform[1, 2]), float(angle))
+
+    def apply_transform(self, transform, shape):
+        x, y, w, h = self.box
+        cx, cy = transform @ np.array([x + w / 2, y + h / 2, 1.0])
+        scale = np.hypot(transform[0, 0], transform[1, 0])
+        w, h = w * scale, h * scale
+        frame_h, frame_w = shape[:2]
+        cx = float(np.clip(cx, 0, frame_w))
+        cy = float(np.clip(cy, 0, frame_h))
+        return (cx - w / 2, cy - h / 2, w, h)
+
+
+TRACKERS = {
+    'csrt': cv2.TrackerCSRT_create,
+    'kcf': cv2.TrackerKCF_create,
+    'lk': FlowTracker,
+}
+
+
+def create_tracker(name='csrt'):
+    return TRACKERS[name]()
@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import struct
+import argparse
+import cv2
+import numpy as np
+import av
+
+MAGIC = b'TIDX1\n'
+# One record per keyframe: pts in stream time base, byte offset in the file, seconds
+RECORD = struct.Struct('<qqd')
+RECORD_DTYPE = np.dtype([('pts', '<i8'), ('pos', '<i8'), ('time', '<f8')])
+
+
+def index_path(video):
+    return video + '.idx'
+
+
+def sheet_path(video, n):
+    return f'{video}.sheet{n:03d}.jpg'
+
+
+class SheetWriter:
+    # Thumbnail mosaic written one fixed-size sheet at a time, so memory stays flat however long the video is
+    def __init__(self, video, thumb_width=160, columns=8, rows=6):
+        self.video = video
+        self.thumb_width = thumb_width
+        self.columns = columns
+        self.rows = rows
+        self.canvas = None
+        self.count = 0
+        self.sheets = []
+        self.times = []
+
+    def add(self, image, t):
+        h, w = image.shape[:2]
+        thumb_h = int(round(h * self.thumb_width / w))
+        if self.canvas is None:
+            self.canvas = np.zeros((thumb_h * self.rows, self.thumb_width * self.columns, 3), dtype=np.uint8)
+        cell = self.count % (self.columns * self.rows)
+        y, x = divmod(cell, self.columns)
+        thumb = cv2.resize(image, (self.thumb_width, thumb_h), interpolation=cv2.INTER_AREA)
+        self.canvas[y * thumb_h:(y + 1) * thumb_h, x * self.thumb_width:(x + 1) * self.thumb_width] = thumb
+        cv2.putText(self.canvas, f'{int(t // 60)}:{t % 60:04.1f}', (x * self.thumb_width + 4, (y + 1) * thumb_h - 6),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        self.times.append(round(t, 3))
+        self.count += 1
+        if cell == self.columns * self.rows - 1:
+            self.flush()
+
+    def flush(self):
+        if self.canvas is None or self.count == len(self.sheets) * self.columns * self.rows:
+            return
+        path = sheet_path(self.video, len(self.sheets))
+        cv2.imwrite(path, self.canvas)
+        self.sheets.append(os.path.basename(path))
+        self.canvas[:] = 0
+
+
+def build_index(video, interval=10.0, thumb_width=160, columns=8, rows=6):
+    # One pass over the packets; only keyframes are decoded, and only for thumbnails
+    with av.open(video) as container:
+        stream = container.streams.video[0]
+        time_base = stream.time_base
+        stream.codec_context.skip_frame = 'NONKEY'
+        sheets = SheetWriter(video, thumb_width, columns, rows)
+        next_thumb = 0.0
+        count = 0
+        last_time = 0.0
+        tmp = index_path(video) + '.tmp'
+        with open(tmp, 'wb') as out:
+            out.write(MAGIC)
+            for packet in container.demux(stream):
+                if packet.pts is None:
+                    continue
+                t = float(packet.pts * time_base)
+                last_time = max(last_time, t)
+                if not packet.is_keyframe:
+                    continue
+                out.write(RECORD.pack(packet.pts, packet.pos if packet.pos is not None else -1, t))
+                count += 1
+                if t >= next_thumb:
+                    for frame in stream.codec_context.decode(packet):
+                        sheets.add(frame.to_ndarray(format='bgr24'), frame.time if frame.time is not None else t)
+                        next_thumb = t + interval
+            sheets.flush()
+
+            stat = os.stat(video)
+            trailer = json.dumps({
+                'video': os.path.basename(video), 'size': stat.st_size, 'mtime': stat.st_mtime,
+                'time_base': [time_base.numerator, time_base.denominator], 'duration': last_time,
+                'fps': float(stream.average_rate or 0), 'width': stream.codec_context.width,
+                'height': stream.codec_context.height, 'codec': stream.codec_context.name, 'keyframes': count,
+                'interval': interval, 'thumb_width': thumb_width, 'columns': columns, 'rows': rows,
+                'sheets': sheets.sheets, 'thumb_times': sheets.times,
+            }).encode()
+            # Trailer last: records are streamed out before the totals are known
+            out.write(trailer)
+            out.write(struct.pack('<q', len(trailer)))
+        os.replace(tmp, index_path(video))
+    return load_index(video)
+
+
+class VideoIndex:
+    def __init__(self, video, info, keyframes):
+        self.video = video
+        self.info = info
+        self.keyframes = keyframes
+
+    @property
+    def duration(self):
+        return self.info['duration']
+
+    def keyframe_before(self, t):
+        i = int(np.searchsorted(self.keyframes['time'], t, side='right')) - 1
+        return self.keyframes[max(i, 0)]
+
+    def is_current(self):
+        try:
+            stat = os.stat(self.video)
+        except OSError:
+            return False
+        return stat.st_size == self.info['size'] and stat.st_mtime == self.info['mtime']
+
+
+def load_index(video):
+    with open(index_path(video), 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{index_path(video)} is not a video index")
+    (length,) = struct.unpack('<q', data[-8:])
+    info = json.loads(data[-8 - length:-8])
+    keyframes = np.frombuffer(data[len(MAGIC):-8 - length], dtype=RECORD_DTYPE)
+    return VideoIndex(video, info, keyframes)
+
+
+def open_index(video, **options):
+    # The sidecar if it still matches the video, otherwise a fresh one
+    if os.path.exists(index_path(video)):
+        index = load_index(video)
+        if index.is_current():
+            return index
+    return build_index(video, **options)
+
+
+def frame_at(index, t):
+    # Seek straight to the keyframe before t and decode at most one GOP
+    with av.open(index.video) as container:
+        stream = container.streams.video[0]
+        key = index.keyframe_before(t)
+        container.seek(int(key['pts']), stream=stream, backward=True)
+        time_base = stream.time_base
+        last = None
+        for frame in container.decode(stream):
+            if frame.pts is not None and float(frame.pts * time_base) > t + 1e-6:
+                break
+            last = frame
+        return last.to_ndarray(format='bgr24') if last is not None else None
+
+
+def add_stream_like(output, stream):
+    # PyAV 14 added add_stream_from_template; 13, the version in Pipfile.lock, takes template= on add_stream
+    if hasattr(output, 'add_stream_from_template'):
+        return output.add_stream_from_template(stream)
+    return output.add_stream(template=stream)
+
+
+def extract_clip(index, start, end, path):
+    # Packet copy from the keyframe before start, no decoding or re-encoding; the clip may begin up to one GOP early
+    with av.open(index.video) as container, av.open(path, 'w') as output:
+        stream = container.streams.video[0]
+        out_stream = add_stream_like(output, stream)
+        key = index.keyframe_before(start)
+        container.seek(int(key['pts']), stream=stream, backward=True)
+        time_base = stream.time_base
+        offset = None
+        for packet in container.demux(stream):
+            if packet.pts is None:
+                continue
+            if float(packet.pts * time_base) > end:
+                break
+            if offset is None:
+                # Clip timestamps start at zero
+                offset = packet.pts
+            packet.pts -= offset
+            if packet.dts is not None:
+                packet.dts -= offset
+            packet.stream = out_stream
+            output.mux(packet)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyframe index, thumbnail sheets, seeking and clip extraction for flight recordings")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('index', help="Index recordings (skips ones with a current index)")
+    p.add_argument('videos', nargs='+')
+    p.add_argument('--interval', type=float, default=10.0, help="Seconds between thumbnails")
+    p.add_argument('--force', action='store_true')
+    p = sub.add_parser('info')
+    p.add_argument('video')
+    p = sub.add_parser('frame', help="Save the frame at a time")
+    p.add_argument('video')
+    p.add_argument('--at', type=float, required=True, help="Seconds")
+    p.add_argument('-o', '--output', default='frame.jpg')
+    p = sub.add_parser('clip', help="Copy a time range into a new file")
+    p.add_argument('video')
+    p.add_argument('--start', type=float, required=True)
+    p.add_argument('--end', type=float, required=True)
+    p.add_argument('-o', '--output', default='clip.mp4')
+    args = parser.parse_args()
+
+    if args.command == 'index':
+        for video in args.videos:
+            if not args.force and os.path.exists(index_path(video)) and load_index(video).is_current():
+                print(f"{video}: up to date")
+                continue
+            index = build_index(video, interval=args.interval)
+            print(f"{video}: {len(index.keyframes)} keyframes, {index.duration:.1f} s, "
+                  f"{len(index.info['sheets'])} thumbnail sheet(s)")
+        return
+
+    index = open_index(args.video)
+    if args.command == 'info':
+        info = dict(index.info, thumb_times=len(index.info['thumb_times']))
+        print(json.dumps(info, indent=2))
+    elif args.command == 'frame':
+        image = frame_at(index, args.at)
+        if image is None:
+            sys.exit(f"No frame at {args.at} s")
+        cv2.imwrite(args.output, image)
+        print(f"Saved {args.output}")
+    elif args.command == 'clip':
+        extract_clip(index, args.start, args.end, args.output)
+        print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import cv2
+
+QUALITIES = {'high': 80, 'low': 40}
+
+INDEX_HTML = b"""<!doctype html>
+<html><head><title>Tello ground station</title></head>
+<body style="background:#111;color:#ddd;font-family:monospace">
+<img src="/stream.mjpg" style="max-width:100%">
+<pre id="telemetry"></pre>
+<script>
+new EventSource('/telemetry').onmessage = function (e) {
+    document.getElementById('telemetry').textContent = JSON.stringify(JSON.parse(e.data), null, 2);
+};
+</script>
+</body></html>
+"""
+
+
+class GroundStation:
+    def __init__(self, host='0.0.0.0', port=8080, qualities=QUALITIES):
+        self.qualities = dict(qualities)
+        self.cond = threading.Condition()
+        self.frame_seq = 0
+        self.frame = None
+        self.telemetry_seq = 0
+        self.telemetry = {}
+        self.running = False
+
+        # One encoded copy per quality for the current frame, shared by every client
+        self._encoded = {name: (0, None) for name in self.qualities}
+        self._encode_locks = {name: threading.Lock() for name in self.qualities}
+
+        handler = type('GroundStationHandler', (GroundStationHandler,), {'station': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def publish_frame(self, frame):
+        # Called from the control loop: only swaps a reference, encoding happens on demand
+        with self.cond:
+            self.frame_seq += 1
+            self.frame = frame
+            self.cond.notify_all()
+
+    def publish_telemetry(self, **values):
+        with self.cond:
+            self.telemetry_seq += 1
+            self.telemetry = values
+            self.cond.notify_all()
+
+    def wait_frame(self, after_seq, timeout=1.0):
+        with self.cond:
+            self.cond.wait_for(lambda: not self.running or self.frame_seq > after_seq, timeout)
+            return self.frame_seq, self.frame
+
+    def wait_telemetry(self, after_seq, timeout=1.0):
+        with self.cond:
+            self.cond.wait_for(lambda: not self.running or self.telemetry_seq > after_seq, timeout)
+            return self.telemetry_seq, self.telemetry
+
+    def encoded(self, quality, seq, frame):
+        with self._encode_locks[quality]:
+            cached_seq, data = self._encoded[quality]
+            if cached_seq >= seq:
+                return data
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.qualities[quality]])
+            data = jpeg.tobytes() if ok else None
+            self._encoded[quality] = (seq, data)
+            return data
+
+
+class GroundStationHandler(BaseHTTPRequestHandler):
+    station = None
+    boundary = 'frame'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        quality = query.get('q', ['high'])[0]
+        if quality not in self.station.qualities:
+            quality = 'high'
+
+        try:
+            if url.path in ('/', '/index.html'):
+                self.send_body(INDEX_HTML, 'text/html')
+            elif url.path == '/stream.mjpg':
+                self.stream_mjpeg(quality)
+            elif url.path == '/snapshot.jpg':
+                seq, frame = self.station.wait_frame(0)
+                data = self.station.encoded(quality, seq, frame) if frame is not None else None
+                if data is None:
+                    self.send_error(503, 'No frame yet')
+                else:
+                    self.send_body(data, 'image/jpeg')
+            elif url.path == '/telemetry':
+                self.stream_telemetry()
+            else:
+                self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_mjpeg(self, quality):
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={self.boundary}')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        seq = 0
+        while self.station.running:
+            # A slow client just misses intermediate frames and gets the newest one
+            new_seq, frame = self.station.wait_frame(seq)
+            if new_seq == seq or frame is None:
+                continue
+            seq = new_seq
+            data = self.station.encoded(quality, seq, frame)
+            if data is None:
+                continue
+            self.wfile.write(f'--{self.boundary}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n\r\n'.encode())
+            self.wfile.write(data)
+            self.wfile.write(b'\r\n')
+
+    def stream_telemetry(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        seq = 0
+        last_sent = 0.0
+        while self.station.running:
+            new_seq, values = self.station.wait_telemetry(seq)
+            if new_seq == seq:
+                # keep-alive comment so proxies and browsers keep the connection open
+                if time.monotonic() - last_sent > 10:
+                    self.wfile.write(b': ping\n\n')
+                    last_sent = time.monotonic()
+                continue
+            seq = new_seq
+            self.wfile.write(f'data: {json.dumps(values)}\n\n'.encode())
+            self.wfile.flush()
+            last_sent = time.monotonic()